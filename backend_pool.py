@@ -0,0 +1,335 @@
+import contextvars
+import logging
+import queue
+import threading
+import time
+
+from chunking import estimate_tokens
+from http_transport import ClientPool
+from job_scheduler import Job, JobCancelled
+from metrics import Histogram, metrics
+from rate_limiter import PRIORITY_INTERACTIVE, is_transient
+from utils import get_openai_non_stream_response, get_openai_stream_response
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class Backend:
+    """One OpenAI-compatible endpoint/model pair and its recent health.
+
+    ``latency`` is an EWMA of the time to first output (the whole request
+    when not streaming). Failures put the backend on an exponentially
+    growing cooldown during which it is only used as a last resort.
+    """
+
+    def __init__(self, name, client_pool, model=None, api_key=None, alpha=0.3, cooldown=30.0):
+        self.name = name
+        self.client_pool = client_pool
+        self.model = model  # None means the global "model" setting
+        self.api_key = api_key  # None means the global "api_key" setting
+        self.alpha = alpha
+        self.cooldown = cooldown
+        self.latency = None
+        self.latencies = Histogram(max_samples=100)
+        self.failures = 0
+        self.unhealthy_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.unhealthy_until
+
+    def record_success(self, latency):
+        with self._lock:
+            self.latency = latency if self.latency is None else (
+                self.alpha * latency + (1 - self.alpha) * self.latency)
+            self.latencies.observe(latency)
+            self.failures = 0
+            self.unhealthy_until = 0.0
+        metrics.observe(f"backend.{self.name}.latency", latency)
+
+    def record_timeout(self, elapsed):
+        # A hedged request that lost without answering took at least this long
+        with self._lock:
+            if self.latency is None or elapsed > self.latency:
+                self.latency = elapsed if self.latency is None else (
+                    self.alpha * elapsed + (1 - self.alpha) * self.latency)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.unhealthy_until = time.monotonic() + min(
+                self.cooldown * 2 ** (self.failures - 1), self.cooldown * 16)
+        metrics.inc(f"backend.{self.name}.errors")
+
+    def p95(self):
+        with self._lock:
+            if self.latencies.count < 5:
+                return None
+            return self.latencies.percentile(95)
+
+
+class BackendPool:
+    """Routes requests across the configured backends.
+
+    Without a "backends" setting there is a single backend on the app's
+    shared client pool. Otherwise each entry gets its own connection pool.
+    Candidates are ordered by health and EWMA latency, and a hotkey can
+    restrict them with its own "backends" list. A request that fails before
+    producing output fails over to the next candidate. With hedging enabled,
+    a second request goes out if the first has produced nothing after the
+    backend's p95 latency; whichever answers first is used and the other is
+    cancelled.
+    """
+
+    def __init__(self, settings, default_pool):
+        self.settings = settings
+        self.default_pool = default_pool
+        self._config = None
+        self._backends = {}
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def backends(self):
+        # Rebuilt when the "backends" setting changes, keeping the health of
+        # entries that did not change
+        config = self.settings.get("backends") or []
+        with self._lock:
+            if config == self._config:
+                return list(self._backends.values())
+            previous, self._backends = self._backends, {}
+            previous_entries, self._entries = self._entries, {}
+            for entry in config or [{"name": "default"}]:
+                name = entry.get("name") or entry.get("base_url") or "default"
+                backend = previous.get(name)
+                if backend is None or previous_entries.get(name) != entry:
+                    backend = self._build(name, entry)
+                self._backends[name] = backend
+                self._entries[name] = entry
+            for name, backend in previous.items():
+                if self._backends.get(name) is not backend and backend.client_pool is not self.default_pool:
+                    backend.client_pool.close()
+            self._config = config
+            return list(self._backends.values())
+
+    def _build(self, name, entry):
+        routing = self.settings.get("routing") or {}
+        pool = self.default_pool
+        if entry.get("base_url"):
+            # Other endpoints only get the rate limits given in their entry
+            pool = ClientPool.from_settings(self.settings, base_url=entry["base_url"], limits=entry)
+        return Backend(
+            name, pool, model=entry.get("model"), api_key=entry.get("api_key"),
+            alpha=routing.get("ewma_alpha", 0.3), cooldown=routing.get("cooldown_s", 30.0))
+
+    def candidates(self, names=None):
+        backends = self.backends()
+        if names:
+            selected = [b for b in backends if b.name in names]
+            if not selected:
+                logger.warning(f"None of the backends {names} are configured, using all of them")
+            backends = selected or backends
+        # Healthy first, fastest first; backends without samples yet count as
+        # fast so they get tried
+        return sorted(backends, key=lambda b: (not b.healthy, b.latency or 0.0))
+
+    def warmup(self):
+        # The default pool is warmed by the app itself
+        for backend in self.backends():
+            if backend.client_pool is not self.default_pool:
+                backend.client_pool.get(self._api_key(backend))
+                backend.client_pool.warmup()
+                backend.client_pool.start_keepalive()
+
+    def close(self):
+        with self._lock:
+            for backend in self._backends.values():
+                if backend.client_pool is not self.default_pool:
+                    backend.client_pool.close()
+
+    def stream(self, messages, max_tokens, hotkey_info=None, job=None, cache=None, model=None):
+        hotkey_info = hotkey_info or {}
+        cached = self._cached(cache, messages, max_tokens, hotkey_info, model)
+        if cached is not None:
+            # Replay the cached answer through the caller's normal paste path
+            return iter([cached])
+
+        def call(backend, attempt):
+            return get_openai_stream_response(
+                self._client(backend), messages=messages, max_tokens=max_tokens,
+                model=self._model(backend, model), job=attempt, cache=cache)
+        return self._race(call, hotkey_info, job, self._estimate(messages, max_tokens))
+
+    def complete(self, messages, max_tokens, hotkey_info=None, job=None, cache=None, model=None):
+        hotkey_info = hotkey_info or {}
+        cached = self._cached(cache, messages, max_tokens, hotkey_info, model)
+        if cached is not None:
+            return cached
+
+        def call(backend, attempt):
+            return [get_openai_non_stream_response(
+                self._client(backend), messages=messages, max_tokens=max_tokens,
+                model=self._model(backend, model), job=attempt, cache=cache)]
+        return "".join(self._race(call, hotkey_info, job, self._estimate(messages, max_tokens)))
+
+    def hedge_delay(self, backend):
+        routing = self.settings.get("routing") or {}
+        p95 = backend.p95()
+        if p95 is None:
+            return routing.get("hedge_initial_delay_ms", 1500) / 1000
+        return max(p95, routing.get("hedge_min_delay_ms", 250) / 1000)
+
+    def _cached(self, cache, messages, max_tokens, hotkey_info, model):
+        # Checked before admission, so a cache hit neither waits for nor
+        # spends rate limit budget, and never counts as a backend sample
+        if cache is None:
+            return None
+        models = dict.fromkeys(
+            self._model(backend, model) for backend in self.candidates(hotkey_info.get("backends")))
+        for candidate in models or [model or self.settings.get("model")]:
+            cached = cache.get(cache.key_for(candidate, messages, max_tokens))
+            if cached is not None:
+                metrics.inc("request.cache_hits")
+                return cached
+        return None
+
+    @staticmethod
+    def _estimate(messages, max_tokens):
+        # What the request counts against a tokens-per-minute limit
+        return estimate_tokens("".join(m["content"] for m in messages)) + (max_tokens or 0)
+
+    def _model(self, backend, model=None):
+        # A backend pinned to a model keeps it whatever the caller asked for
+        return backend.model or model or self.settings.get("model")
+
+    def _api_key(self, backend):
+        return backend.api_key or self.settings.get("api_key")
+
+    def _client(self, backend):
+        return backend.client_pool.get(self._api_key(backend))
+
+    def _race(self, call, hotkey_info, job, tokens):
+        remaining = self.candidates(hotkey_info.get("backends"))
+        priority = hotkey_info.get("priority", PRIORITY_INTERACTIVE)
+        hedge = hotkey_info.get("hedge", (self.settings.get("routing") or {}).get("hedge", False))
+        events = queue.Queue()
+        attempts = []
+        failed = set()
+        winner = None
+        live = 0
+
+        def launch():
+            backend = remaining.pop(0)
+            index = len(attempts)
+            # Each attempt gets its own cancellable job so losers can be
+            # closed without touching the caller's
+            attempt = Job(index, backend.name, call, (), {})
+            attempts.append((backend, attempt, time.perf_counter()))
+            if job is not None:
+                job.on_cancel(attempt.cancel)
+            # Run in a copy of the caller's context to keep its request ID
+            threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(self._attempt, index, backend, attempt, call, events, tokens, priority),
+                name=f"backend-{backend.name}", daemon=True).start()
+
+        if job is not None:
+            # Wake up right away on cancel rather than when the attempts notice
+            job.on_cancel(lambda: events.put((None, None)))
+        launch()
+        live += 1
+        hedged = False
+        try:
+            while True:
+                timeout = None
+                if hedge and not hedged and winner is None and remaining:
+                    timeout = self.hedge_delay(attempts[0][0])
+                try:
+                    index, item = events.get(timeout=timeout)
+                except queue.Empty:
+                    hedged = True
+                    metrics.inc("request.hedged")
+                    logger.info(f"No answer from '{attempts[0][0].name}' after {timeout * 1000:.0f} ms, hedging")
+                    launch()
+                    live += 1
+                    continue
+
+                if index is None:
+                    job.check_cancelled()
+                if winner is not None and index != winner:
+                    continue
+                if isinstance(item, BaseException):
+                    if winner is not None:
+                        raise item
+                    live -= 1
+                    failed.add(index)
+                    if job is not None:
+                        job.check_cancelled()
+                    if not isinstance(item, JobCancelled) and not is_transient(item):
+                        # Every backend would refuse it the same way, e.g. a
+                        # prompt longer than the context window
+                        raise item
+                    if remaining and not isinstance(item, JobCancelled):
+                        logger.warning(f"Backend '{attempts[index][0].name}' failed, trying the next one: {item}")
+                        launch()
+                        live += 1
+                    elif live == 0:
+                        raise item
+                    continue
+                if winner is None:
+                    winner = index
+                    if index > 0:
+                        metrics.inc("request.hedge_wins" if hedged else "request.failovers")
+                    for other, (backend, attempt, started) in enumerate(attempts):
+                        if other != winner and other not in failed:
+                            attempt.cancel()
+                            backend.record_timeout(time.perf_counter() - started)
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            # Also runs when the consumer stops early
+            for _, attempt, _ in attempts:
+                attempt.cancel()
+
+    @staticmethod
+    def _attempt(index, backend, attempt, call, events, tokens, priority):
+        limiter = backend.client_pool.rate_limiter
+        retries = 0
+        try:
+            while True:
+                limiter.acquire(tokens, priority, attempt)
+                start = time.perf_counter()
+                first = True
+                try:
+                    for delta in call(backend, attempt):
+                        attempt.check_cancelled()
+                        if first:
+                            first = False
+                            backend.record_success(time.perf_counter() - start)
+                        events.put((index, delta))
+                    attempt.check_cancelled()
+                    if first:
+                        backend.record_success(time.perf_counter() - start)
+                    events.put((index, _DONE))
+                    return
+                except JobCancelled:
+                    raise
+                except Exception as e:
+                    # Rate limits and transient errors are retried with backoff,
+                    # but only while nothing has been handed out yet
+                    delay = limiter.retry_delay(e, retries) if first else None
+                    if delay is None:
+                        # A bad request says nothing about the backend's health
+                        if is_transient(e):
+                            backend.record_failure()
+                        events.put((index, e))
+                        return
+                    retries += 1
+                    metrics.inc("request.retries")
+                    logger.warning(f"Request to '{backend.name}' failed, retry {retries} in {delay:.1f} s: {e}")
+                    attempt.sleep(delay)
+        except JobCancelled as e:
+            events.put((index, e))
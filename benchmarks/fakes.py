@@ -0,0 +1,47 @@
+import threading
+import time
+
+
+class FakeDesktop:
+    """Stands in for pyperclip, pyautogui and keyboard: a clipboard, a
+    highlighted selection and a target app that records what gets pasted."""
+
+    def __init__(self, selection="", copy_latency=0.005, key_latency=0.001):
+        self.selection = selection
+        self.copy_latency = copy_latency
+        self.key_latency = key_latency
+        self.clipboard = "original clipboard"
+        self.pasted = []
+        self._lock = threading.Lock()
+
+    def copy(self, text):
+        with self._lock:
+            self.clipboard = text
+
+    def paste(self):
+        with self._lock:
+            return self.clipboard
+
+    def send_keys(self, *keys):
+        time.sleep(self.key_latency)
+        if keys == ("ctrl", "c"):
+            # Like a real app, the copy lands on the clipboard a bit later
+            threading.Timer(self.copy_latency, self.copy, args=(self.selection,)).start()
+        elif keys == ("ctrl", "v"):
+            with self._lock:
+                self.pasted.append(self.clipboard)
+
+    def is_pressed(self, key):
+        return False
+
+    def backends(self):
+        return {"copy": self.copy, "paste": self.paste,
+                "send_keys": self.send_keys, "is_pressed": self.is_pressed}
+
+    def pasted_text(self):
+        with self._lock:
+            return "".join(self.pasted)
+
+    def reset(self):
+        with self._lock:
+            self.pasted.clear()
@@ -0,0 +1,155 @@
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing pooled keep-alive connections is expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class MockOpenAIServer:
+    """Local OpenAI-compatible server for benchmarks.
+
+    Serves /v1/models and /v1/chat/completions (streaming and not) with a
+    configurable time to first token, token rate and injected errors.
+    """
+
+    def __init__(self, ttft=0.3, tokens_per_sec=50.0, tokens=100, error_rate=0.0,
+                 error_status=500, models=("gpt-mock",), seed=None, host="127.0.0.1", port=0):
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.models = list(models)
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def expected_time(self, max_tokens=None):
+        # Server-side time for one response, i.e. the floor for end-to-end latency
+        return self.ttft + (self._token_count(max_tokens) - 1) / self.tokens_per_sec
+
+    def _token_count(self, max_tokens):
+        return max(1, min(self.tokens, max_tokens or self.tokens))
+
+    def _should_fail(self):
+        with self._lock:
+            self.requests += 1
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return fail
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if self.path.rstrip("/") != "/v1/models":
+                    self._send_json(404, {"error": {"message": "Not found"}})
+                    return
+                self._send_json(200, {"object": "list", "data": [
+                    {"id": model, "object": "model", "created": 0, "owned_by": "mock"}
+                    for model in server.models]})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.rstrip("/") != "/v1/chat/completions":
+                    self._send_json(404, {"error": {"message": "Not found"}})
+                    return
+                if server._should_fail():
+                    # Rate limited clients are told when to come back
+                    headers = {"Retry-After": "1"} if server.error_status == 429 else {}
+                    self._send_json(server.error_status, {"error": {
+                        "message": "Injected failure", "type": "server_error"}}, headers)
+                    return
+
+                model = body.get("model", server.models[0])
+                count = server._token_count(body.get("max_tokens"))
+                tokens = [f"tok{i} " if i % 12 != 11 else f"tok{i}. " for i in range(count)]
+                if body.get("stream"):
+                    self._stream(model, tokens)
+                else:
+                    time.sleep(server.expected_time(count))
+                    self._send_json(200, {
+                        "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": "".join(tokens)}}],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": count, "total_tokens": count}})
+
+            def _stream(self, model, tokens):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                start = time.perf_counter()
+                for i, token in enumerate(tokens):
+                    # Pace tokens against an absolute schedule so slow writes do not drift
+                    delay = start + server.ttft + i / server.tokens_per_sec - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    self._write_event({
+                        "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": 0,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]})
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+            def _write_event(self, payload):
+                self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode())
+
+            def _write_chunk(self, data):
+                self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
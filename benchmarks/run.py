@@ -0,0 +1,158 @@
+"""Headless benchmark of the hotkey trigger pipeline.
+
+Drives TriggerPipeline through the JobScheduler against a local mock
+OpenAI-compatible server, with fake clipboard and keystroke backends, so it
+runs without a display, keyboard hook or API key:
+
+    python -m benchmarks.run --presses 20 --ttft 0.3 --tps 80
+    python -m benchmarks.run --json bench.json --max-overhead-ms 400
+
+Exits with status 1 when --max-overhead-ms is given and the p95 overhead of
+any mode exceeds it, so CI can catch regressions.
+"""
+import argparse
+import json
+import logging
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from backend_pool import BackendPool
+from benchmarks.fakes import FakeDesktop
+from benchmarks.mock_server import MockOpenAIServer
+from clipboard import ClipboardIO
+from http_transport import ClientPool
+from job_scheduler import JobScheduler
+from metrics import metrics
+from settings_manager import SettingsManager
+from trigger_pipeline import TriggerPipeline
+
+DEFAULTS_FILE = Path(__file__).resolve().parent.parent / "defaults.json"
+HOTKEY = "proofread"
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def run_mode(stream, args, server, workdir):
+    metrics.reset()
+    settings = SettingsManager(
+        config_file=Path(workdir) / f"config-{'stream' if stream else 'non-stream'}.json",
+        defaults_file=DEFAULTS_FILE, save_delay=0)
+    # Without its size policy the hotkey asks for exactly --tokens, which the
+    # overhead figures are measured against
+    hotkeys = dict(settings.get("hotkeys") or {})
+    hotkeys[HOTKEY] = {k: v for k, v in hotkeys.get(HOTKEY, {}).items() if k != "policy"}
+    settings.update({
+        "stream": stream, "model": server.models[0], "max_tokens": args.tokens, "api_key": "sk-benchmark",
+        "hotkeys": hotkeys})
+    prompt = hotkeys[HOTKEY].get("prompt", "")
+
+    client_pool = ClientPool(base_url=server.base_url)
+    client_pool.get("sk-benchmark")
+    client_pool.warmup(background=False)
+    scheduler = JobScheduler(max_workers=2)
+    desktop = FakeDesktop(selection=args.selection, copy_latency=args.copy_latency / 1000)
+    clipboard = ClipboardIO.from_settings(settings, lock=scheduler.clipboard_lock, **desktop.backends())
+    pipeline = TriggerPipeline(settings, BackendPool(settings, client_pool), clipboard)
+
+    latencies = []
+    pasted_chars = 0
+    try:
+        for _ in range(args.presses):
+            desktop.reset()
+            job = scheduler.submit(HOTKEY, pipeline.on_triggered, prompt)
+            job.done.wait()
+            latencies.append(job.finished_at - job.submitted_at)
+            pasted_chars += len(desktop.pasted_text())
+    finally:
+        scheduler.shutdown()
+        client_pool.close()
+
+    floor = server.expected_time(args.tokens)
+    overheads = [latency - floor for latency in latencies]
+    summary = metrics.summary()
+    total_time = sum(latencies)
+    return {
+        "mode": "stream" if stream else "non-stream",
+        "presses": args.presses,
+        "errors": metrics.counters().get("trigger.errors", 0),
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p95_ms": percentile(latencies, 95) * 1000,
+        "overhead_p50_ms": percentile(overheads, 50) * 1000,
+        "overhead_p95_ms": percentile(overheads, 95) * 1000,
+        "ttft_p50_ms": _stage_ms(summary, "request.ttft"),
+        "capture_p50_ms": _stage_ms(summary, "trigger.capture"),
+        "paste_p50_ms": _stage_ms(summary, "trigger.paste"),
+        "chars_per_sec": pasted_chars / total_time if total_time else 0.0,
+    }
+
+
+def _stage_ms(summary, name):
+    p50 = summary.get(name, {}).get("p50")
+    return None if p50 is None else p50 * 1000
+
+
+def format_table(results):
+    columns = ["mode", "presses", "errors", "latency_p50_ms", "latency_p95_ms",
+               "overhead_p50_ms", "overhead_p95_ms", "ttft_p50_ms", "capture_p50_ms",
+               "paste_p50_ms", "chars_per_sec"]
+    lines = ["  ".join(f"{column:>15}" for column in columns)]
+    for result in results:
+        cells = []
+        for column in columns:
+            value = result[column]
+            cells.append(f"{value:>15.1f}" if isinstance(value, float) else f"{str(value):>15}")
+        lines.append("  ".join(cells))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the hotkey trigger pipeline headless.")
+    parser.add_argument("--presses", type=int, default=10, help="hotkey presses per mode")
+    parser.add_argument("--modes", default="stream,non-stream", help="comma-separated: stream, non-stream")
+    parser.add_argument("--ttft", type=float, default=0.3, help="mock time to first token, seconds")
+    parser.add_argument("--tps", type=float, default=80.0, help="mock tokens per second")
+    parser.add_argument("--tokens", type=int, default=120, help="tokens per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing")
+    parser.add_argument("--copy-latency", type=float, default=5.0, help="fake ctrl+c latency, ms")
+    parser.add_argument("--selection", default="Ths sentense has a typo.", help="highlighted text")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--max-overhead-ms", type=float, help="fail if p95 overhead exceeds this")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(name)s %(levelname)s: %(message)s")
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+
+    results = []
+    with MockOpenAIServer(ttft=args.ttft, tokens_per_sec=args.tps, tokens=args.tokens,
+                          error_rate=args.error_rate, seed=args.seed) as server, \
+            tempfile.TemporaryDirectory() as workdir:
+        for mode in modes:
+            started = time.perf_counter()
+            results.append(run_mode(mode == "stream", args, server, workdir))
+            print(f"{mode}: {args.presses} presses in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+    print(format_table(results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=4)
+
+    if args.max_overhead_ms is not None:
+        slow = [r for r in results if r["overhead_p95_ms"] > args.max_overhead_ms]
+        for result in slow:
+            print(f"FAIL: {result['mode']} p95 overhead {result['overhead_p95_ms']:.0f} ms "
+                  f"> {args.max_overhead_ms:.0f} ms", file=sys.stderr)
+        return 1 if slow else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+import contextvars
+import logging
+import math
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4  # Rough average for English text
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?…])\s+")
+WHITESPACE = re.compile(r"\s+")
+
+# Context window in tokens by model name prefix, most specific first
+CONTEXT_WINDOWS = (
+    ("gpt-4.1", 1047576),
+    ("gpt-4o", 128000),
+    ("gpt-4-turbo", 128000),
+    ("gpt-4-32k", 32768),
+    ("gpt-4", 8192),
+    ("gpt-3.5-turbo", 16385),
+    ("o1", 200000),
+    ("o3", 200000),
+    ("o4", 200000),
+)
+DEFAULT_CONTEXT_WINDOW = 8192
+
+_DONE = object()
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def context_window(model, overrides=None):
+    # ``overrides`` maps model name prefixes to tokens, like CONTEXT_WINDOWS
+    model = model or ""
+    for table in ((overrides or {}).items(), CONTEXT_WINDOWS):
+        matches = [(prefix, tokens) for prefix, tokens in table if model.startswith(prefix)]
+        if matches:
+            return max(matches, key=lambda match: len(match[0]))[1]
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def chunk_budget_chars(window, max_tokens, ratio=0.8, output_ratio=None, max_output=None):
+    # What is left of the context window once the answer is reserved, with
+    # headroom for the prompt. Rewrites (``output_ratio``) come back about
+    # as long as they went in, so their chunks must also fit ``max_output``.
+    tokens = (window - (max_tokens or 0)) * ratio
+    if output_ratio and max_output:
+        tokens = min(tokens, max_output / output_ratio)
+    return max(1, int(tokens)) * CHARS_PER_TOKEN
+
+
+def split_text(text, max_chars):
+    """Split text into [(chunk, separator), ...] on paragraph, then sentence
+    boundaries, so that ``"".join(c + s for c, s in result) == text``."""
+    pieces = []
+    for part, separator in _split_keep(text, PARAGRAPH_BREAK):
+        if len(part) <= max_chars:
+            pieces.append((part, separator))
+            continue
+        sentences = _split_keep(part, SENTENCE_BREAK)
+        sentences[-1] = (sentences[-1][0], sentences[-1][1] + separator)
+        for sentence, sentence_separator in sentences:
+            if len(sentence) <= max_chars:
+                pieces.append((sentence, sentence_separator))
+            else:
+                pieces.extend(_hard_split(sentence, sentence_separator, max_chars))
+
+    # Pack neighbouring pieces back together up to the budget
+    chunks = []
+    for piece, separator in pieces:
+        if chunks and len(chunks[-1][0]) + len(chunks[-1][1]) + len(piece) <= max_chars:
+            previous, previous_separator = chunks[-1]
+            chunks[-1] = (previous + previous_separator + piece, separator)
+        else:
+            chunks.append((piece, separator))
+    return chunks
+
+
+def split_for_settings(text, settings, hotkey_info, model=None, max_tokens=None):
+    # Splits text that would not fit the model's context window; a single
+    # (text, "") chunk when it fits or the hotkey does not opt in with
+    # "chunk": true, since splitting breaks prompts that need the whole text
+    chunking = settings.get("chunking") or {}
+    if not hotkey_info.get("chunk") or not chunking.get("enabled", True):
+        return [(text, "")]
+    max_chars = chunk_budget_chars(
+        context_window(model or settings.get("model"), chunking.get("context_windows")),
+        max_tokens or settings.get("max_tokens"),
+        chunking.get("budget_ratio", 0.8),
+        (hotkey_info.get("policy") or {}).get("output_ratio"),
+        settings.get("allowed_tokens_range", [1, 4096])[1])
+    if len(text) <= max_chars:
+        return [(text, "")]
+    return split_text(text, max_chars)
+
+
+def _split_keep(text, pattern):
+    result = []
+    position = 0
+    for match in pattern.finditer(text):
+        result.append((text[position:match.start()], match.group()))
+        position = match.end()
+    result.append((text[position:], ""))
+    return result
+
+
+def _hard_split(text, separator, max_chars):
+    # Last resort for a single over-long sentence: break at whitespace
+    result = []
+    while len(text) > max_chars:
+        cut = max((m.start() for m in WHITESPACE.finditer(text, 0, max_chars)), default=0)
+        if cut == 0:
+            cut = max_chars
+        space = WHITESPACE.match(text, cut)
+        end = space.end() if space else cut
+        result.append((text[:cut], text[cut:end]))
+        text = text[end:]
+    result.append((text, separator))
+    return result
+
+
+def map_chunks(chunks, request, max_parallel=4):
+    # Non-streaming: run every chunk concurrently, reassemble in order
+    return "".join(iter_chunks(chunks, request, max_parallel))
+
+
+def iter_chunks(chunks, request, max_parallel=4):
+    # Like map_chunks, but yields each output (and its separator) as soon as
+    # the chunks before it are done, so callers need not hold them all
+    executor = ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="chunk")
+    try:
+        futures = [executor.submit(contextvars.copy_context().run, request, chunk) for chunk, _ in chunks]
+        for future, (_, separator) in zip(futures, chunks):
+            yield future.result()
+            if separator:
+                yield separator
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def stream_chunks(chunks, stream, max_parallel=4):
+    """Streaming: run the chunks concurrently and yield their deltas in
+    order. Chunk N is yielded live as soon as chunks 0..N-1 are done; its
+    earlier deltas are buffered until then."""
+    queues = [queue.Queue() for _ in chunks]
+    stop = threading.Event()
+
+    def produce(index, chunk):
+        deltas = None
+        try:
+            if stop.is_set():
+                return
+            deltas = stream(chunk)
+            for delta in deltas:
+                if stop.is_set():
+                    break
+                queues[index].put(delta)
+        except BaseException as e:
+            queues[index].put(e)
+        finally:
+            if deltas is not None and hasattr(deltas, "close"):
+                deltas.close()
+            queues[index].put(_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="chunk")
+    try:
+        for index, (chunk, _) in enumerate(chunks):
+            # Each chunk keeps the caller's context (e.g. its request ID)
+            executor.submit(contextvars.copy_context().run, produce, index, chunk)
+        for index, (_, separator) in enumerate(chunks):
+            done = False
+            while not done:
+                # Hand over everything already buffered as one delta, so a
+                # finished chunk is pasted in one go rather than token by token
+                items = [queues[index].get()]
+                while items[-1] is not _DONE and not isinstance(items[-1], BaseException):
+                    try:
+                        items.append(queues[index].get_nowait())
+                    except queue.Empty:
+                        break
+                if items[-1] is _DONE:
+                    done = True
+                    items.pop()
+                elif isinstance(items[-1], BaseException):
+                    raise items[-1]
+                if items:
+                    yield "".join(items)
+            if separator:
+                yield separator
+    finally:
+        # Also runs when the consumer stops early (e.g. a cancelled job)
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
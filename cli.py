@@ -0,0 +1,263 @@
+"""Run a hotkey prompt over many documents without the GUI.
+
+Inputs are files, directories (searched with --glob) or, with no paths or
+"-", JSON lines on stdin with "text" and an optional "id". Results are
+written as JSON lines, in input order or as they complete:
+
+    python cli.py proofread notes/ --glob "*.md" -o results.jsonl
+    cat docs.jsonl | python cli.py fact_check --concurrency 8 --order completion
+
+The prompts, model, token limits, backends and rate limits come from the
+same config.json and defaults.json as the tray app. The rate limiter lives
+in this process only: a running tray app does not see the batch's
+requests, so leave it headroom with --rpm/--tpm. With --checkpoint,
+finished documents are recorded as they complete; a rerun with the same
+checkpoint replays them instead of asking the API again.
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from app_dirs import user_cache_dir
+from backend_pool import BackendPool
+from http_transport import ClientPool
+from job_scheduler import Job, JobCancelled
+from model_policy import ModelPolicy
+from model_registry import ModelRegistry
+from prompt_chain import pipeline_stages
+from rate_limiter import PRIORITY_BATCH
+from response_cache import ResponseCache
+from settings_manager import SettingsManager
+from trigger_pipeline import TriggerPipeline
+
+logger = logging.getLogger("cli")
+
+CONFIG_FILE = "config.json"
+DEFAULTS_FILE = Path(__file__).resolve().parent / "defaults.json"
+CACHE_DIR = user_cache_dir() / "responses"  # Shared with the tray app
+
+
+def read_inputs(paths, pattern):
+    # Yields (id, text, error) in a stable order. An input that cannot be
+    # read has no text and says why in error, so it fails on its own
+    # instead of ending the whole batch.
+    if not paths or paths == ["-"]:
+        for number, line in enumerate(sys.stdin, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield str(number), None, f"Line {number} is not valid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield str(number), None, f"Line {number} is not a JSON object"
+                continue
+            doc_id = str(record.get("id", number))
+            if not isinstance(record.get("text"), str):
+                yield doc_id, None, f'Line {number} has no "text" string'
+                continue
+            yield doc_id, record["text"], None
+        return
+    for path in map(Path, paths):
+        files = sorted(p for p in path.rglob(pattern) if p.is_file()) if path.is_dir() else [path]
+        for file in files:
+            try:
+                text = file.read_text(encoding="utf-8")
+            except (OSError, ValueError) as e:  # ValueError: not UTF-8
+                yield str(file), None, f"Could not read {file}: {e}"
+                continue
+            yield str(file), text, None
+
+
+def load_checkpoint(path):
+    done = {}
+    if path is None or not path.exists():
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line cut short by an interrupted run
+            done[record["id"]] = record
+    return done
+
+
+class BatchRunner:
+    """Sends each document through the same TriggerPipeline as a hotkey
+    press, minus the clipboard, at batch priority behind any interactive
+    work queued on the same rate limiter."""
+
+    def __init__(self, settings, action, backends, cache=None, policy=None):
+        hotkey_info = (settings.get("hotkeys") or {}).get(action)
+        if not isinstance(hotkey_info, dict) or hotkey_info.get("type") == "repaste":
+            raise ValueError(f"Unknown action '{action}'")
+        if "pipeline" in hotkey_info:
+            pipeline_stages(settings.get("hotkeys"), action)  # Raises ValueError if invalid
+        self.action = action
+        self.prompt = hotkey_info.get("prompt", "")
+        self.hotkey_info = dict(hotkey_info, priority=PRIORITY_BATCH)
+        self.pipeline = TriggerPipeline(settings, backends, None, cache=cache, policy=policy)
+        self.job = Job(0, action, None, (), {})  # Cancelled on interrupt
+
+    def process(self, doc_id, text):
+        start = time.perf_counter()
+        model, max_tokens = self.pipeline.policy.select(self.hotkey_info, text)
+        chunks = self.pipeline.split_selection(text, self.hotkey_info, model, max_tokens)
+        output = "".join(self.pipeline.answer(
+            self.job, self.hotkey_info, self.prompt, chunks, model, max_tokens, stream=False))
+        return {
+            "id": doc_id,
+            "action": self.action,
+            "model": model,
+            "output": output,
+            "chunks": len(chunks),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+
+def run(runner, inputs, output, checkpoint=None, concurrency=4, ordered=True):
+    done = load_checkpoint(checkpoint)
+    checkpoint_file = open(checkpoint, "a", encoding="utf-8") if checkpoint else None
+    lock = threading.Lock()
+    counts = {"done": 0, "resumed": 0, "failed": 0}
+
+    def emit(record):
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+
+    def task(doc_id, text):
+        try:
+            record = runner.process(doc_id, text)
+        except JobCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"{doc_id}: {e}")
+            return {"id": doc_id, "action": runner.action, "error": str(e)}
+        if checkpoint_file is not None:
+            with lock:
+                checkpoint_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                checkpoint_file.flush()
+        return record
+
+    # Input order: results wait in `finished` until everything before them
+    # has been written. Submission is bounded so huge inputs are streamed.
+    finished = {}
+    next_index = 0
+    pending = {}
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+
+    def finish(index, record):
+        if ordered:
+            finished[index] = record
+        else:
+            emit(record)
+
+    def collect(block):
+        nonlocal next_index
+        completed = set()
+        if pending:
+            completed, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in completed:
+            index = pending.pop(future)
+            record = future.result()
+            counts["failed" if "error" in record else "done"] += 1
+            finish(index, record)
+        while next_index in finished:
+            emit(finished.pop(next_index))
+            next_index += 1
+
+    try:
+        for index, (doc_id, text, error) in enumerate(inputs):
+            if error is not None:
+                # Reported in its place and left out of the checkpoint, so a
+                # rerun tries it again
+                logger.error(f"{doc_id}: {error}")
+                counts["failed"] += 1
+                finish(index, {"id": doc_id, "action": runner.action, "error": error})
+                collect(block=False)
+                continue
+            if doc_id in done:
+                # Already paid for in an earlier run
+                counts["resumed"] += 1
+                finish(index, done[doc_id])
+                collect(block=False)
+                continue
+            while len(pending) >= concurrency * 2:
+                collect(block=True)
+            pending[executor.submit(task, doc_id, text)] = index
+        while pending:
+            collect(block=True)
+        collect(block=False)
+    except KeyboardInterrupt:
+        logger.warning("Interrupted, cancelling outstanding requests")
+        runner.job.cancel()
+        raise
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        if checkpoint_file is not None:
+            checkpoint_file.close()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a hotkey prompt over files or JSON lines.")
+    parser.add_argument("action", help="hotkey action whose prompt to use, e.g. proofread")
+    parser.add_argument("paths", nargs="*", help="files or directories; stdin JSON lines if omitted or '-'")
+    parser.add_argument("--glob", default="*", help="file pattern inside directories")
+    parser.add_argument("-o", "--output", help="write results here instead of stdout")
+    parser.add_argument("--order", choices=["input", "completion"], default="input")
+    parser.add_argument("--concurrency", type=int, default=4, help="documents in flight at once")
+    parser.add_argument("--checkpoint", type=Path, help="record finished documents here and skip them on rerun")
+    parser.add_argument("--rpm", type=int, help="requests per minute limit for this run")
+    parser.add_argument("--tpm", type=int, help="tokens per minute limit for this run")
+    parser.add_argument("--config", default=CONFIG_FILE)
+    parser.add_argument("--defaults", default=DEFAULTS_FILE)
+    parser.add_argument("--no-cache", action="store_true", help="do not use the response cache")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(name)s %(levelname)s: %(message)s")
+    settings = SettingsManager(config_file=args.config, defaults_file=args.defaults)
+
+    limits = None
+    if args.rpm or args.tpm:
+        # Flags given override the configured limits; the others still apply
+        limits = dict(settings.get("rate_limit") or {})
+        limits.update({name: value for name, value in (("rpm", args.rpm), ("tpm", args.tpm)) if value})
+    client_pool = ClientPool.from_settings(settings, limits=limits)
+    backends = BackendPool(settings, client_pool)
+    cache = None if args.no_cache else ResponseCache.from_settings(CACHE_DIR, settings)
+    try:
+        # Policy models are checked against the tray app's cached model list
+        policy = ModelPolicy(settings, ModelRegistry())
+        runner = BatchRunner(settings, args.action, backends, cache=cache, policy=policy)
+    except ValueError as e:
+        parser.error(str(e))
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    started = time.perf_counter()
+    try:
+        counts = run(runner, read_inputs(args.paths, args.glob), output, checkpoint=args.checkpoint,
+                     concurrency=args.concurrency, ordered=args.order == "input")
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        backends.close()
+        client_pool.close()
+    print(f"{counts['done']} done, {counts['resumed']} resumed, {counts['failed']} failed "
+          f"in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
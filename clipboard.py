@@ -0,0 +1,154 @@
+import contextlib
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+MODIFIERS = ("ctrl", "shift", "alt", "windows")
+
+
+class ClipboardIO:
+    """Captures the highlighted text and pastes responses through the system
+    clipboard, leaving the user's clipboard as it was.
+
+    Instead of fixed sleeps, capture waits for the hotkey's modifiers to be
+    released and then polls, with exponential backoff, for the clipboard to
+    replace a sentinel value.
+    """
+
+    def __init__(self, lock=None, copy=None, paste=None, send_keys=None, is_pressed=None,
+                 capture_timeout=1.0, release_timeout=1.0, paste_settle=0.1,
+                 initial_delay=0.002, max_delay=0.02):
+        self.lock = lock or threading.RLock()
+        # Held by one job for all of its pastes, so that answers of jobs
+        # running at the same time never interleave at the cursor
+        self.paste_target = threading.RLock()
+        self._copy = copy
+        self._paste = paste
+        self._send_keys = send_keys
+        self._is_pressed = is_pressed
+        self._backends_lock = threading.Lock()
+        self.capture_timeout = capture_timeout
+        self.release_timeout = release_timeout
+        self.paste_settle = paste_settle
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.last_capture_latency = None  # Seconds, including the key release wait
+
+    @classmethod
+    def from_settings(cls, settings, lock=None, **backends):
+        clipboard_settings = settings.get("clipboard") or {}
+        return cls(
+            lock=lock,
+            capture_timeout=clipboard_settings.get("capture_timeout_ms", 1000) / 1000,
+            release_timeout=clipboard_settings.get("release_timeout_ms", 1000) / 1000,
+            paste_settle=clipboard_settings.get("paste_settle_ms", 100) / 1000,
+            **backends)
+
+    def load_backends(self):
+        # Default backends are imported on first use (pyautogui alone takes a
+        # noticeable part of startup), and never when fakes are swapped in
+        with self._backends_lock:
+            if self._copy is None or self._paste is None:
+                import pyperclip
+                self._copy = self._copy or pyperclip.copy
+                self._paste = self._paste or pyperclip.paste
+            if self._send_keys is None:
+                import pyautogui
+                self._send_keys = pyautogui.hotkey
+            if self._is_pressed is None:
+                import keyboard
+                self._is_pressed = keyboard.is_pressed
+
+    def wait_for_modifiers_released(self):
+        # Sending ctrl+c while the user still holds e.g. shift would send a
+        # different shortcut, so wait for the hotkey to be let go
+        return self._poll(self._modifiers_released, self.release_timeout)
+
+    def capture_selection(self):
+        start = time.perf_counter()
+        self.load_backends()
+        if not self.wait_for_modifiers_released():
+            logger.warning("Modifier keys still held, copying anyway")
+
+        with self.lock:
+            original_clipboard = self._paste()
+            sentinel = f"tibikey-{uuid.uuid4().hex}"
+            self._copy(sentinel)
+            try:
+                self._send_keys("ctrl", "c")
+                changed = self._poll(lambda: self._paste() != sentinel, self.capture_timeout)
+                text = self._paste() if changed else ""
+            finally:
+                self._copy(original_clipboard)
+
+        self.last_capture_latency = time.perf_counter() - start
+        logger.debug(f"Captured selection in {self.last_capture_latency * 1000:.1f} ms")
+        return text
+
+    @contextlib.contextmanager
+    def paste_session(self, job=None):
+        """Yields a paste function for one job's whole answer. The first
+        paste waits until no other job owns the paste target; from then on
+        this job owns it until the session ends.
+
+        The user's clipboard is saved on the first paste and put back once
+        at the end, rather than copied out and back for every piece."""
+        owned = False
+        original_clipboard = None
+
+        def paste(text):
+            nonlocal owned, original_clipboard
+            if not owned:
+                self.load_backends()
+                # Poll so that cancelling the waiting job still takes effect
+                while not self.paste_target.acquire(timeout=0.1):
+                    if job is not None:
+                        job.check_cancelled()
+                owned = True
+                with self.lock:
+                    original_clipboard = self._paste()
+            with self.lock:
+                self._copy(text)
+                self._send_keys("ctrl", "v")
+                # The target app reads the clipboard asynchronously; give it
+                # a moment before the clipboard changes again
+                time.sleep(self.paste_settle)
+
+        try:
+            yield paste
+        finally:
+            if owned:
+                try:
+                    with self.lock:
+                        self._copy(original_clipboard)
+                finally:
+                    original_clipboard = None
+                    self.paste_target.release()
+
+    def paste_text(self, text):
+        with self.paste_session() as paste:
+            paste(text)
+
+    def _modifiers_released(self):
+        for key in MODIFIERS:
+            try:
+                if self._is_pressed(key):
+                    return False
+            except ValueError:
+                continue  # Key name not known on this platform
+        return True
+
+    def _poll(self, condition, timeout):
+        deadline = time.perf_counter() + timeout
+        delay = self.initial_delay
+        while True:
+            if condition():
+                return True
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.max_delay)
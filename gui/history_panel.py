@@ -0,0 +1,84 @@
+from datetime import datetime
+
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtWidgets import (QApplication, QHBoxLayout, QLineEdit, QListWidget,
+                             QListWidgetItem, QPlainTextEdit, QPushButton,
+                             QVBoxLayout, QWidget)
+
+
+class HistoryPanel(QWidget):
+    """Searchable list of past answers. Selecting one loads and shows it in
+    full; Copy puts it on the clipboard without asking the API again. The
+    list itself only holds previews."""
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+
+        self.searchEdit = QLineEdit()
+        self.searchEdit.setPlaceholderText("Search history...")
+        # Search once typing pauses rather than on every keystroke
+        self.searchTimer = QTimer(self)
+        self.searchTimer.setSingleShot(True)
+        self.searchTimer.setInterval(200)
+        self.searchTimer.timeout.connect(self.refresh)
+        self.searchEdit.textChanged.connect(self.searchTimer.start)
+
+        self.resultList = QListWidget()
+        self.resultList.currentItemChanged.connect(self.showEntry)
+        self.outputBox = QPlainTextEdit()
+        self.outputBox.setReadOnly(True)
+
+        self.copyButton = QPushButton("Copy")
+        self.copyButton.clicked.connect(self.copyEntry)
+        self.refreshButton = QPushButton("Refresh")
+        self.refreshButton.clicked.connect(self.refresh)
+        self.clearButton = QPushButton("Clear history")
+        self.clearButton.clicked.connect(self.clearHistory)
+
+        buttonLayout = QHBoxLayout()
+        buttonLayout.addWidget(self.copyButton)
+        buttonLayout.addWidget(self.refreshButton)
+        buttonLayout.addStretch()
+        buttonLayout.addWidget(self.clearButton)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.searchEdit)
+        layout.addWidget(self.resultList)
+        layout.addWidget(self.outputBox)
+        layout.addLayout(buttonLayout)
+        self.setLayout(layout)
+
+        self.refresh()
+
+    def refresh(self):
+        self.resultList.clear()
+        self.outputBox.clear()
+        for entry in self.history.search(self.searchEdit.text()):
+            created = datetime.fromtimestamp(entry["created"]).strftime("%Y-%m-%d %H:%M")
+            preview = " ".join(entry["input"].split())[:80]
+            item = QListWidgetItem(f"{created}  [{entry['hotkey']}]  {preview}")
+            item.setData(Qt.ItemDataRole.UserRole, entry["id"])
+            self.resultList.addItem(item)
+
+    def showEntry(self, item, _previous=None):
+        entry = self.entryFor(item)
+        if entry is None:
+            self.outputBox.clear()
+            return
+        self.outputBox.setPlainText(entry["output"])
+
+    def copyEntry(self):
+        # The box holds the selected entry's output, already loaded
+        if self.resultList.currentItem() is not None:
+            QApplication.clipboard().setText(self.outputBox.toPlainText())
+
+    def entryFor(self, item):
+        if item is None:
+            return None
+        return self.history.get(item.data(Qt.ItemDataRole.UserRole))
+
+    def clearHistory(self):
+        self.history.clear()
+        self.history.flush()
+        self.refresh()
@@ -0,0 +1,121 @@
+import logging
+import os
+import re
+from collections import deque
+
+from PyQt6.QtCore import QFileSystemWatcher
+from PyQt6.QtWidgets import (QComboBox, QHBoxLayout, QLineEdit,
+                             QPlainTextEdit, QVBoxLayout, QWidget)
+
+# Matches the level in '%(asctime)s %(name)s %(levelname)s: %(message)s'
+LEVEL_PATTERN = re.compile(r" (DEBUG|INFO|WARNING|ERROR|CRITICAL): ")
+
+
+class LogViewer(QWidget):
+    """Tails a log file: keeps a byte offset, reads only appended bytes when
+    the file watcher fires, and shows the last ``max_lines`` lines."""
+
+    LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+    def __init__(self, log_file, max_lines=2000, parent=None):
+        super().__init__(parent)
+        self.log_file = os.path.abspath(log_file)
+        self.max_lines = max_lines
+        self.lines = deque(maxlen=max_lines)  # (level number, text)
+        self._offset = 0
+        self._file_id = None
+        self._partial = b""
+        self._skip_line = False
+        self._last_level = logging.DEBUG
+
+        self.levelComboBox = QComboBox()
+        self.levelComboBox.addItems(self.LEVELS)
+        self.levelComboBox.currentIndexChanged.connect(self.refilter)
+        self.filterEdit = QLineEdit()
+        self.filterEdit.setPlaceholderText("Filter...")
+        self.filterEdit.textChanged.connect(self.refilter)
+
+        self.textBox = QPlainTextEdit()
+        self.textBox.setReadOnly(True)
+        self.textBox.setMaximumBlockCount(max_lines)
+
+        filterLayout = QHBoxLayout()
+        filterLayout.addWidget(self.levelComboBox)
+        filterLayout.addWidget(self.filterEdit)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(filterLayout)
+        layout.addWidget(self.textBox)
+        self.setLayout(layout)
+
+        # Watch the directory too, so creation and rotation are noticed
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.addPath(os.path.dirname(self.log_file))
+        self.watcher.fileChanged.connect(self.readAppended)
+        self.watcher.directoryChanged.connect(self.onDirectoryChanged)
+        self.onDirectoryChanged()
+
+    def onDirectoryChanged(self, _path=None):
+        if os.path.exists(self.log_file) and self.log_file not in self.watcher.files():
+            self.watcher.addPath(self.log_file)
+        self.readAppended()
+
+    def readAppended(self, _path=None):
+        try:
+            stat = os.stat(self.log_file)
+        except FileNotFoundError:
+            return
+        file_id = (stat.st_dev, stat.st_ino)
+        if file_id != self._file_id or stat.st_size < self._offset:
+            # New, rotated or truncated file: start over, but only load the
+            # tail that fits into the buffer
+            self._file_id = file_id
+            self._partial = b""
+            self._offset = max(0, stat.st_size - self.max_lines * 200)
+            self._skip_line = self._offset > 0  # Tail starts mid-line
+        if stat.st_size == self._offset:
+            return
+
+        with open(self.log_file, "rb") as f:
+            f.seek(self._offset)
+            data = f.read(stat.st_size - self._offset)
+        self._offset += len(data)
+
+        chunks = (self._partial + data).split(b"\n")
+        self._partial = chunks.pop()
+        if self._skip_line and chunks:
+            chunks.pop(0)
+            self._skip_line = False
+        self.appendLines(chunk.decode("utf-8", errors="replace").rstrip("\r") for chunk in chunks)
+
+    def appendLines(self, texts):
+        visible = []
+        for text in texts:
+            match = LEVEL_PATTERN.search(text)
+            if match:
+                self._last_level = logging.getLevelName(match.group(1))
+            # Continuation lines (tracebacks) inherit the previous level
+            entry = (self._last_level, text)
+            self.lines.append(entry)
+            if self.matches(entry):
+                visible.append(text)
+        if visible:
+            self.textBox.appendPlainText("\n".join(visible))
+            self.scrollToEnd()
+
+    def matches(self, entry):
+        level, text = entry
+        if level < logging.getLevelName(self.levelComboBox.currentText()):
+            return False
+        needle = self.filterEdit.text()
+        return not needle or needle.lower() in text.lower()
+
+    def refilter(self):
+        self.textBox.setPlainText("\n".join(text for level, text in self.lines
+                                            if self.matches((level, text))))
+        self.scrollToEnd()
+
+    def scrollToEnd(self):
+        scrollBar = self.textBox.verticalScrollBar()
+        if scrollBar is not None:
+            scrollBar.setValue(scrollBar.maximum())
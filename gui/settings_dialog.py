@@ -1,24 +1,35 @@
+import json
 from pathlib import Path
 
-import openai
-from openai import OpenAI
-from PyQt6.QtCore import Qt, QTimer
-from PyQt6.QtGui import QTextCursor
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
 from PyQt6.QtWidgets import (QCheckBox, QComboBox, QDialog, QFileDialog,
                              QGroupBox, QHBoxLayout, QLabel, QLineEdit,
-                             QMessageBox, QPushButton, QTextEdit, QVBoxLayout)
-
-from utils import get_openai_models, validate_max_tokens, validate_model
+                             QMessageBox, QPushButton, QVBoxLayout)
+
+from gui.history_panel import HistoryPanel
+from gui.log_viewer import LogViewer
+from hotkey_registry import hotkey_bindings
+from memory_usage import format_bytes, memory_usage
+from metrics import metrics
+from utils import validate_max_tokens
 import logging
 
 
 class SettingsDialog(QDialog):
     LOG_FILE = "app.log"
 
-    def __init__(self, client, settings):
+    # Emitted from the model registry's worker thread, delivered on the GUI thread
+    modelsLoaded = pyqtSignal(list, object)
+
+    def __init__(self, client, settings, cache=None, model_registry=None, client_pool=None,
+                 history=None):
         super().__init__()
         self.client = client
+        self.client_pool = client_pool
         self.settings = settings
+        self.cache = cache
+        self.model_registry = model_registry
+        self.history = history
 
         self.setWindowTitle("Your Service Name")
         self.setWindowFlags(
@@ -63,6 +74,16 @@ class SettingsDialog(QDialog):
         self.importLayout.addWidget(self.importLabel)
         self.importLayout.addWidget(self.importButton)
 
+        self.cacheLayout = QHBoxLayout()
+        self.cacheLabel = QLabel("Response cache:")
+        self.cacheStatsLabel = QLabel("disabled")
+        self.cacheClearButton = QPushButton("Clear")
+        self.cacheClearButton.clicked.connect(self.clearCache)
+        self.cacheClearButton.setEnabled(self.cache is not None)
+        self.cacheLayout.addWidget(self.cacheLabel)
+        self.cacheLayout.addWidget(self.cacheStatsLabel)
+        self.cacheLayout.addWidget(self.cacheClearButton)
+
         self.saveButton = QPushButton("Save")
         self.saveButton.clicked.connect(self.saveSettings)
 
@@ -72,32 +93,60 @@ class SettingsDialog(QDialog):
         self.generalLayout.addLayout(self.maxTokensLayout)
         self.generalLayout.addLayout(self.streamLayout)
         self.generalLayout.addLayout(self.importLayout)
+        self.generalLayout.addLayout(self.cacheLayout)
         self.generalLayout.addWidget(self.saveButton)
 
         # Set the layout for the general settings group
         self.generalSettingsGroup.setLayout(self.generalLayout)
 
+        # Performance section
+        self.metricsGroup = QGroupBox("Performance (p50 / p95)")
+        self.metricsLayout = QVBoxLayout()
+        self.metricsLabel = QLabel("No requests yet")
+        self.metricsLabel.setStyleSheet("font-family: monospace")
+        self.metricsLabel.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        self.metricsLayout.addWidget(self.metricsLabel)
+        self.memoryLabel = QLabel()
+        self.metricsLayout.addWidget(self.memoryLabel)
+        self.metricsGroup.setLayout(self.metricsLayout)
+
         # Log section
         self.logGroup = QGroupBox("Log")
         self.logLayout = QVBoxLayout()
-        self.logTextBox = QTextEdit(self)
-        self.logLayout.addWidget(self.logTextBox)
+        self.logViewer = LogViewer(self.LOG_FILE, parent=self)
+        self.logLayout.addWidget(self.logViewer)
 
         # Set the layout for the log group
         self.logGroup.setLayout(self.logLayout)
 
         # Add groups to the main layout
         self.mainLayout.addWidget(self.generalSettingsGroup)
+        self.mainLayout.addWidget(self.metricsGroup)
+        if self.history is not None:
+            # History section
+            self.historyGroup = QGroupBox("History")
+            self.historyLayout = QVBoxLayout()
+            self.historyPanel = HistoryPanel(self.history, parent=self)
+            self.historyLayout.addWidget(self.historyPanel)
+            self.historyGroup.setLayout(self.historyLayout)
+            self.mainLayout.addWidget(self.historyGroup)
         self.mainLayout.addWidget(self.logGroup)
 
         self.setLayout(self.mainLayout)
 
+        self.modelsLoaded.connect(self.onModelsLoaded)
+        if self.model_registry is not None:
+            self.model_registry.add_listener(self.modelsLoaded.emit)
+
         # Load existing settings
         self.loadSettings()
 
-        # Start the timer to update the log
+        # Start the timer to update the stats; the log viewer follows the
+        # log file on its own
         self.timer = QTimer()
-        self.timer.timeout.connect(self.updateLog)
+        self.timer.timeout.connect(self.updateCacheStats)
+        self.timer.timeout.connect(self.updateMetrics)
+        self.timer.timeout.connect(self.updateMemory)
         self.timer.start(1000)  # Update every 1000ms (1 second)
 
     def setApiKey(self, api_key):
@@ -107,7 +156,15 @@ class SettingsDialog(QDialog):
         file_name, _ = QFileDialog.getOpenFileName(
             self, "Import config", "", "JSON Files (*.json)")
         if file_name:
-            self.settings.load(Path(file_name))
+            try:
+                # Refuse configs with clashing hotkeys before anything changes
+                with open(file_name) as f:
+                    imported = json.load(f)
+                hotkey_bindings(imported.get("hotkeys", self.settings.defaults.get("hotkeys")))
+                self.settings.load(Path(file_name))
+            except (OSError, ValueError) as e:
+                QMessageBox.critical(self, "Import Error", f"Could not import {file_name}: {e}")
+                return
             self.loadSettings()
 
     def loadSettings(self):
@@ -118,41 +175,49 @@ class SettingsDialog(QDialog):
 
             self.apiKeyEdit.setText(self.settings.get("api_key", ""))
 
-            # Clear the modelComboBox before adding new items
-            self.modelComboBox.clear()
+            # Fill the combo box from the cached model list; a stale list is
+            # refreshed in the background and arrives via modelsLoaded
+            self.populateModels()
+            if self.model_registry is not None:
+                self.model_registry.refresh_async(self.client)
 
-            # Determine the correct models to load
-            api_key = self.settings.get("api_key", "")
-            if self.client and api_key == self.apiKeyEdit.text():
-                available_models = self.settings.load_models_from_cache()
-            else:
-                if self.client:
-                    available_models = get_openai_models(self.client)
-                    self.settings.save_models_to_cache(available_models)
-                else:
-                    available_models = []
+            self.maxTokensEdit.setText(str(max_tokens))
+            self.streamCheckBox.setChecked(self.settings.get("stream", False))
+        except Exception as e:
+            QMessageBox.warning(self, "Settings Load Error", f"Could not load settings: {e}")
 
-            # Ensure the current model from settings is included in the list
-            model_from_config = self.settings.get("model")
-            if model_from_config not in available_models:
-                available_models.append(model_from_config)
+    def populateModels(self):
+        available_models = self.model_registry.models() if self.model_registry else []
 
+        # Ensure the current model from settings is included in the list
+        model_from_config = self.settings.get("model")
+        if model_from_config and model_from_config not in available_models:
+            available_models.append(model_from_config)
+
+        # Repopulating must not be mistaken for the user picking a model
+        self.modelComboBox.blockSignals(True)
+        try:
+            self.modelComboBox.clear()
             if available_models:
                 self.modelComboBox.addItems(available_models)
-                model_index = self.modelComboBox.findText(model_from_config)
-                if model_index != -1:
-                    self.modelComboBox.setCurrentIndex(model_index)
-                else:
-                    self.modelComboBox.setCurrentIndex(0)
+                model_index = self.modelComboBox.findText(model_from_config or "")
+                self.modelComboBox.setCurrentIndex(max(model_index, 0))
+                self.modelComboBox.setEnabled(True)
             else:
-                # Clear the modelComboBox and disable it if no models are available
-                self.modelComboBox.clear()
+                # Disable the modelComboBox if no models are available
                 self.modelComboBox.setEnabled(False)
+        finally:
+            self.modelComboBox.blockSignals(False)
 
-            self.maxTokensEdit.setText(str(max_tokens))
-            self.streamCheckBox.setChecked(self.settings.get("stream", False))
-        except Exception as e:
-            QMessageBox.warning(self, "Settings Load Error", f"Could not load settings: {e}")
+    def onModelsLoaded(self, models, error):
+        import openai  # Already loaded by the refresh that reported back
+        if isinstance(error, openai.AuthenticationError):
+            QMessageBox.warning(self, "Invalid API Key", "The provided API key is invalid.")
+            self.modelComboBox.clear()
+            self.modelComboBox.setEnabled(False)
+            return
+        if models:
+            self.populateModels()
 
     def onModelChanged(self, index):
         model = self.modelComboBox.currentText()
@@ -160,6 +225,7 @@ class SettingsDialog(QDialog):
             self.settings.set("model", model)
 
     def saveSettings(self):
+        import openai  # Deferred so opening the dialog does not load the SDK
         try:
             max_tokens = int(self.maxTokensEdit.text())
             allowed_tokens_range = self.settings.get("allowed_tokens_range", [1, 4096])
@@ -168,50 +234,65 @@ class SettingsDialog(QDialog):
 
             api_key_changed = api_key != self.settings.get("api_key")
             if api_key_changed:
-                self.client = OpenAI(api_key=api_key)
-                self.settings.set_client(self.client)
-                models = get_openai_models(self.client)
-                if models:
-                    self.modelComboBox.clear()
-                    self.modelComboBox.addItems(models)
-                    self.settings.save_models_to_cache(models)
-                    self.modelComboBox.setEnabled(True)
+                # Reuse the pooled connections when there is a pool
+                if self.client_pool is not None:
+                    self.client = self.client_pool.get(api_key)
                 else:
-                    QMessageBox.warning(self, "Invalid API Key", "The provided API key is invalid.")
-                    self.modelComboBox.clear()
-                    self.modelComboBox.setEnabled(False)
-                    return  # Do not save settings or close the dialog
-
-            # Validate and set the model only if necessary
-            model = self.modelComboBox.currentText()
-            if model and model != self.settings.get("model"):
-                validate_model(model, self.client)
-                self.settings.set("model", model)
-
-            # Save the selected model
-            model = self.modelComboBox.currentText()
-            if model:
-                self.settings.set("model", model)
-
-            self.settings.set("api_key", api_key)
-            self.settings.set("max_tokens", max_tokens)
-            self.settings.set("stream", self.streamCheckBox.isChecked())
-
-            self.settings.save()  # Ensure settings are saved to the file
+                    self.client = openai.OpenAI(api_key=api_key)
+                # Fetch the models for the new key off the GUI thread
+                if self.model_registry is not None:
+                    self.model_registry.refresh_async(self.client, force=True)
+
+            # Apply everything as one batch so the config is written once
+            with self.settings.batch():
+                # Validate and set the model only if necessary
+                model = self.modelComboBox.currentText()
+                if model and model != self.settings.get("model"):
+                    self.settings.set("model", model)
+
+                self.settings.set("api_key", api_key)
+                self.settings.set("max_tokens", max_tokens)
+                self.settings.set("stream", self.streamCheckBox.isChecked())
+            self.settings.flush()  # Save clicks are written right away
         except openai.AuthenticationError as e:
             QMessageBox.critical(self, "Authentication Error", str(e))
         except ValueError as e:
             QMessageBox.critical(self, "Error", str(e))
 
-    def updateLog(self):
-        try:
-            with open(self.LOG_FILE) as f:
-                log_content = f.read()
-                if self.logTextBox.toPlainText() != log_content:
-                    self.logTextBox.setPlainText(log_content)
-                    cursor = self.logTextBox.textCursor()
-                    cursor.movePosition(QTextCursor.MoveOperation.End)
-                    self.logTextBox.setTextCursor(cursor)
-        except FileNotFoundError:
-            pass
-
+    def clearCache(self):
+        if self.cache is not None:
+            self.cache.clear()
+            self.updateCacheStats()
+
+    def updateCacheStats(self):
+        if self.cache is None:
+            return
+        stats = self.cache.stats()
+        self.cacheStatsLabel.setText(
+            f"{stats['hits']} hits, {stats['misses']} misses, {stats['entries']} in memory")
+
+    def updateMetrics(self):
+        if not self.isVisible():
+            return
+        rows = []
+        for name, snapshot in metrics.summary().items():
+            if snapshot["p50"] is None:
+                continue
+            if snapshot["unit"] == "s":
+                values = f"{snapshot['p50'] * 1000:8.0f} ms {snapshot['p95'] * 1000:8.0f} ms"
+            else:
+                values = f"{snapshot['p50']:8.0f}    {snapshot['p95']:8.0f}"
+            rows.append(f"{name:<28}{values}  (n={snapshot['count']})")
+        if rows:
+            self.metricsLabel.setText("\n".join(rows))
+
+    def updateMemory(self):
+        if not self.isVisible():
+            return
+        current, peak = memory_usage()
+        parts = []
+        if current is not None:
+            parts.append(f"{format_bytes(current)} in use")
+        if peak is not None:
+            parts.append(f"peak {format_bytes(peak)}")
+        self.memoryLabel.setText("Memory: " + (", ".join(parts) or "unavailable"))
@@ -1,13 +1,17 @@
-from PyQt6.QtCore import QCoreApplication
+from PyQt6.QtCore import QCoreApplication, pyqtSignal
 from PyQt6.QtGui import QAction  # Corrected import for QAction
-from PyQt6.QtWidgets import QMenu, QSystemTrayIcon
+from PyQt6.QtWidgets import QDialog, QMenu, QSystemTrayIcon
 
 
 class TrayIcon(QSystemTrayIcon):
-    def __init__(self, icon, dialog, app, parent=None):
+    # Emitted from worker threads, shown on the GUI thread
+    notified = pyqtSignal(str, str)
+
+    def __init__(self, icon, dialog, app, parent=None, scheduler=None):
         super().__init__(icon, parent)
         self.dialog = dialog
         self.app = app
+        self.scheduler = scheduler
         self.setToolTip("Your Service Name")
 
         # Create the menu
@@ -16,6 +20,12 @@ class TrayIcon(QSystemTrayIcon):
         settings_action.triggered.connect(self.show_settings_dialog)
         self.menu.addAction(settings_action)
 
+        if self.scheduler is not None:
+            self.cancel_action = QAction("Cancel requests", self)
+            self.cancel_action.triggered.connect(self.scheduler.cancel_all)
+            self.menu.addAction(self.cancel_action)
+            self.menu.aboutToShow.connect(self.update_job_status)
+
         quit_action = QAction("Quit", self)
         quit_action.triggered.connect(QCoreApplication.quit)
         self.menu.addAction(quit_action)
@@ -29,6 +39,7 @@ class TrayIcon(QSystemTrayIcon):
 
         # Connect the activated signal to a slot
         self.activated.connect(self.on_activated)
+        self.notified.connect(self.show_notification)
 
         self.show()
 
@@ -37,5 +48,22 @@ class TrayIcon(QSystemTrayIcon):
         if reason == QSystemTrayIcon.ActivationReason.Trigger:
             self.show_settings_dialog()
 
+    def update_job_status(self):
+        queued = self.scheduler.queue_depth()
+        running = self.scheduler.running_count()
+        self.cancel_action.setText(
+            f"Cancel requests ({running} running, {queued} queued)")
+        self.cancel_action.setEnabled(bool(queued or running))
+
     def show_settings_dialog(self):
+        # The dialog may be passed as a factory so it is only built when needed
+        if callable(self.dialog) and not isinstance(self.dialog, QDialog):
+            self.dialog = self.dialog()
         self.dialog.show()
+
+    def notify(self, title, message):
+        # Safe to call from any thread
+        self.notified.emit(title, message)
+
+    def show_notification(self, title, message):
+        self.showMessage(title, message, QSystemTrayIcon.MessageIcon.Warning)
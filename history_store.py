@@ -0,0 +1,232 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    hotkey TEXT NOT NULL,
+    model TEXT,
+    input TEXT NOT NULL,
+    output TEXT NOT NULL,
+    latency REAL,
+    tokens INTEGER
+);
+CREATE INDEX IF NOT EXISTS history_created ON history (created);
+CREATE INDEX IF NOT EXISTS history_hotkey ON history (hotkey, created);
+"""
+
+# External-content FTS index kept in step with the table by triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+    input, output, content='history', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, input, output) VALUES (new.id, new.input, new.output);
+END;
+CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, input, output)
+    VALUES ('delete', old.id, old.input, old.output);
+END;
+"""
+
+_COLUMNS = "id, created, hotkey, model, input, output, latency, tokens"
+# What listings return: a short preview of the input and no output, so a
+# page of results stays small however long the answers are
+_LIST_COLUMNS = "id, created, hotkey, model, substr(input, 1, 200) AS input, latency, tokens"
+_CLEAR = object()
+_CLOSE = object()
+
+
+class HistoryStore:
+    """SQLite history of answered triggers with a full-text index.
+
+    ``record()`` only queues the row; a background thread opens the
+    database, writes in batches and periodically trims the table to
+    ``max_entries`` rows and ``max_age`` seconds, giving the freed pages
+    back to the file system. Searches use FTS5 when the SQLite build has it
+    and LIKE otherwise, and wait for the database to be opened.
+    """
+
+    PRUNE_EVERY = 100  # Retention pass every N writes
+
+    def __init__(self, path, max_entries=5000, max_age=90 * 24 * 3600):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.fts = False
+        self._queue = queue.SimpleQueue()
+        self._writes = 0
+        self._ready = threading.Event()  # Set once the schema is in place
+        self._reader = None
+        self._reader_lock = threading.Lock()
+
+        # Nothing touches the database here, so building the store costs
+        # nothing on the startup path
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    @classmethod
+    def from_settings(cls, path, settings):
+        history_settings = settings.get("history") or {}
+        if not history_settings.get("enabled", True):
+            return None
+        return cls(
+            path,
+            max_entries=history_settings.get("max_entries", 5000),
+            max_age=history_settings.get("max_age_days", 90) * 24 * 3600)
+
+    def record(self, hotkey, model, input_text, output, latency=None, tokens=None):
+        # Called on the trigger path: never touches the database
+        if output:
+            self._queue.put((time.time(), hotkey, model, input_text, output, latency, tokens))
+
+    def search(self, query, limit=100):
+        query = query.strip()
+        if not query:
+            return self.recent(limit)
+        self._ready.wait()  # Whether FTS5 is there is only known by then
+        if self.fts:
+            # Every word must match as a prefix, quoted so user input is
+            # never parsed as FTS query syntax
+            words = [f'"{word.replace(chr(34), chr(34) * 2)}"*' for word in query.split()]
+            sql = (f"SELECT {_LIST_COLUMNS} FROM history WHERE id IN "
+                   f"(SELECT rowid FROM history_fts WHERE history_fts MATCH ?) "
+                   f"ORDER BY created DESC LIMIT ?")
+            return self._query(sql, (" ".join(words), limit))
+        pattern = f"%{query}%"
+        sql = (f"SELECT {_LIST_COLUMNS} FROM history WHERE input LIKE ? OR output LIKE ? "
+               f"ORDER BY created DESC LIMIT ?")
+        return self._query(sql, (pattern, pattern, limit))
+
+    def recent(self, limit=100):
+        return self._query(f"SELECT {_LIST_COLUMNS} FROM history ORDER BY created DESC LIMIT ?", (limit,))
+
+    def get(self, entry_id):
+        # The full entry, output included
+        rows = self._query(f"SELECT {_COLUMNS} FROM history WHERE id = ?", (entry_id,))
+        return rows[0] if rows else None
+
+    def latest(self):
+        rows = self._query(f"SELECT {_COLUMNS} FROM history ORDER BY created DESC LIMIT 1", ())
+        return rows[0] if rows else None
+
+    def count(self):
+        rows = self._query("SELECT COUNT(*) AS count FROM history", ())
+        return rows[0]["count"] if rows else 0
+
+    def clear(self):
+        self._queue.put(_CLEAR)
+
+    def flush(self):
+        # Waits until everything queued so far has been written
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        self._queue.put(_CLOSE)
+        self._writer.join(timeout=5)
+        with self._reader_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _open(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        connection = self._connect()
+        # Only takes effect on a new database, before any table exists
+        connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.executescript(_SCHEMA)
+        try:
+            connection.executescript(_FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite has no FTS5, history search falls back to LIKE: {e}")
+        connection.commit()
+        return connection
+
+    def _query(self, sql, params):
+        self._ready.wait()
+        try:
+            with self._reader_lock:
+                if self._reader is None:
+                    self._reader = self._connect()
+                return [dict(row) for row in self._reader.execute(sql, params)]
+        except sqlite3.Error as e:
+            logger.error(f"History query failed: {e}")
+            return []
+
+    def _write_loop(self):
+        try:
+            connection = self._open()
+        except sqlite3.Error as e:
+            logger.error(f"Could not open history {self.path}: {e}")
+            connection = None
+        finally:
+            self._ready.set()
+        if connection is not None:
+            self._prune(connection)
+        while True:
+            items = [self._queue.get()]
+            # Write whatever else is already queued in the same transaction
+            while len(items) < 100:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [item for item in items if isinstance(item, tuple)]
+            if connection is None:
+                rows = []  # History is unavailable; just keep the queue moving
+            try:
+                if rows:
+                    with connection:
+                        connection.executemany(
+                            "INSERT INTO history (created, hotkey, model, input, output, latency, tokens) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                    self._writes += len(rows)
+                    if self._writes >= self.PRUNE_EVERY:
+                        self._writes = 0
+                        self._prune(connection)
+                if _CLEAR in items and connection is not None:
+                    with connection:
+                        connection.execute("DELETE FROM history")
+                    self._compact(connection)
+            except sqlite3.Error as e:
+                logger.error(f"Could not write history: {e}")
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if _CLOSE in items:
+                if connection is not None:
+                    connection.close()
+                return
+
+    def _prune(self, connection):
+        try:
+            with connection:
+                connection.execute("DELETE FROM history WHERE created < ?", (time.time() - self.max_age,))
+                connection.execute(
+                    "DELETE FROM history WHERE id NOT IN "
+                    "(SELECT id FROM history ORDER BY created DESC LIMIT ?)", (self.max_entries,))
+            self._compact(connection)
+        except sqlite3.Error as e:
+            logger.error(f"Could not prune history: {e}")
+
+    def _compact(self, connection):
+        if self.fts:
+            with connection:
+                connection.execute("INSERT INTO history_fts (history_fts) VALUES ('optimize')")
+        connection.execute("PRAGMA incremental_vacuum")
+        connection.commit()
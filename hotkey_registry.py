@@ -0,0 +1,111 @@
+import logging
+import threading
+
+from prompt_chain import pipeline_stages
+
+logger = logging.getLogger(__name__)
+
+
+class HotkeyConflictError(ValueError):
+    pass
+
+
+def normalize_combo(combo):
+    # "Shift+Ctrl+R" and "ctrl+shift+r" are the same hotkey to the keyboard
+    # module; steps of a multi-step hotkey keep their order
+    steps = []
+    for step in combo.split(","):
+        keys = sorted(key.strip().lower() for key in step.split("+") if key.strip())
+        steps.append("+".join(keys))
+    return ", ".join(steps)
+
+
+def hotkey_bindings(hotkeys):
+    # Returns {normalized combo: (key_combo, action)} for the "hotkeys"
+    # setting, raising HotkeyConflictError if two actions share a combo
+    bindings = {}
+    conflicts = []
+    for action, hotkey_info in (hotkeys or {}).items():
+        if not isinstance(hotkey_info, dict):
+            continue
+        key_combo = hotkey_info.get("key_combo")
+        # Re-paste hotkeys answer from the history and pipelines use the
+        # prompts of their stages, so neither has a prompt of its own
+        needs_prompt = hotkey_info.get("type") != "repaste" and "pipeline" not in hotkey_info
+        if not key_combo or (needs_prompt and hotkey_info.get("prompt") is None):
+            logger.error(f"Missing 'key_combo' or 'prompt' for action '{action}'")
+            continue
+        if "pipeline" in hotkey_info:
+            try:
+                pipeline_stages(hotkeys, action)
+            except ValueError as e:
+                logger.error(str(e))
+                continue
+        combo = normalize_combo(key_combo)
+        if combo in bindings:
+            conflicts.append(f"'{key_combo}' is used by both '{bindings[combo][1]}' and '{action}'")
+            continue
+        bindings[combo] = (key_combo, action)
+    if conflicts:
+        raise HotkeyConflictError("Conflicting hotkeys: " + "; ".join(conflicts))
+    return bindings
+
+
+class HotkeyRegistry:
+    """Keeps the global keyboard hooks in line with the "hotkeys" setting.
+
+    There is one hook per key combination, and it looks up the action bound
+    to its combo when it fires, so the prompt and other per-hotkey settings
+    are always read fresh. ``apply()`` diffs the new config against what is
+    registered and only adds or removes the combos that changed, adding
+    before removing so no hotkey is ever missing during a reload.
+    """
+
+    def __init__(self, on_fire, add_hotkey=None, remove_hotkey=None):
+        if add_hotkey is None or remove_hotkey is None:
+            import keyboard
+            add_hotkey = add_hotkey or keyboard.add_hotkey
+            remove_hotkey = remove_hotkey or keyboard.remove_hotkey
+        self.on_fire = on_fire  # Called with the action name, on the hook thread
+        self._add_hotkey = add_hotkey
+        self._remove_hotkey = remove_hotkey
+        self._actions = {}  # normalized combo -> action
+        self._handles = {}  # normalized combo -> (key_combo, keyboard handle)
+        self._lock = threading.Lock()
+
+    def apply(self, hotkeys):
+        # Nothing is touched if the new config has conflicts
+        bindings = hotkey_bindings(hotkeys)
+        with self._lock:
+            added = [combo for combo in bindings if combo not in self._handles]
+            removed = [combo for combo in self._handles if combo not in bindings]
+
+            for combo in added:
+                key_combo, action = bindings[combo]
+                try:
+                    handle = self._add_hotkey(key_combo, self._fire, args=(combo,))
+                    self._handles[combo] = (key_combo, handle)
+                    logger.info(f"Registered hotkey {key_combo} for action '{action}'")
+                except Exception as e:
+                    logger.error(f"Failed to register hotkey {key_combo} for action '{action}': {e}")
+            # Combos that stay registered just point at their new action
+            self._actions = {combo: action for combo, (_, action) in bindings.items()}
+            for combo in removed:
+                key_combo, handle = self._handles.pop(combo)
+                try:
+                    self._remove_hotkey(handle)
+                    logger.info(f"Unregistered hotkey {key_combo}")
+                except Exception as e:
+                    logger.error(f"Failed to unregister hotkey {key_combo}: {e}")
+
+    def actions(self):
+        with self._lock:
+            return dict(self._actions)
+
+    def clear(self):
+        self.apply({})
+
+    def _fire(self, combo):
+        action = self._actions.get(combo)
+        if action is not None:
+            self.on_fire(action)
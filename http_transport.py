@@ -0,0 +1,136 @@
+import importlib.util
+import logging
+import threading
+import time
+
+from metrics import trace_connection
+from rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+
+class ClientPool:
+    """Owns one explicitly configured httpx connection pool and the OpenAI
+    client built on top of it.
+
+    Rebuilding the client (e.g. after an API key change) keeps the pool, so
+    established connections survive. The pool is warmed at startup and again
+    whenever it has been idle for ``rewarm_after`` seconds.
+    """
+
+    def __init__(self, base_url=None, max_connections=10, max_keepalive_connections=5,
+                 keepalive_expiry=300.0, http2=False, timeout=60.0, rewarm_after=240.0,
+                 rate_limiter=None):
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip("/")
+        self.rewarm_after = rewarm_after
+        # Shared by everything that talks to this endpoint; fed from the
+        # rate limit headers of every response
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.last_used = 0.0
+        self._api_key = None
+        self._client = None
+        self._http_client = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._keepalive = None
+
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed, using HTTP/1.1")
+            http2 = False
+        self._http_options = {
+            "http2": http2,
+            "timeout": timeout,
+            "limits": {
+                "max_connections": max_connections,
+                "max_keepalive_connections": max_keepalive_connections,
+                "keepalive_expiry": keepalive_expiry,
+            },
+        }
+
+    @classmethod
+    def from_settings(cls, settings, base_url=None, limits=None):
+        http_settings = settings.get("http") or {}
+        return cls(
+            base_url=base_url or http_settings.get("base_url"),
+            max_connections=http_settings.get("max_connections", 10),
+            max_keepalive_connections=http_settings.get("max_keepalive_connections", 5),
+            keepalive_expiry=http_settings.get("keepalive_expiry", 300.0),
+            http2=http_settings.get("http2", False),
+            timeout=http_settings.get("timeout", 60.0),
+            rewarm_after=http_settings.get("rewarm_after", 240.0),
+            rate_limiter=RateLimiter.from_settings(settings, limits))
+
+    @property
+    def client(self):
+        return self._client
+
+    @property
+    def http_client(self):
+        # httpx and openai are only imported once a connection is needed, so
+        # they stay off the startup path
+        with self._lock:
+            if self._http_client is None:
+                import httpx
+                options = dict(self._http_options)
+                options["limits"] = httpx.Limits(**options["limits"])
+                self._http_client = httpx.Client(
+                    event_hooks={"request": [self._on_request, trace_connection],
+                                 "response": [self._on_response]}, **options)
+            return self._http_client
+
+    def get(self, api_key):
+        # Only build a new OpenAI client when the key changes; the connection
+        # pool underneath is shared either way
+        with self._lock:
+            if self._client is None or api_key != self._api_key:
+                from openai import OpenAI
+                # Retries are done by the backend pool, paced by the rate limiter
+                self._client = OpenAI(
+                    api_key=api_key, base_url=self.base_url, http_client=self.http_client,
+                    max_retries=0)
+                self._api_key = api_key
+            return self._client
+
+    def warmup(self, background=True):
+        if background:
+            threading.Thread(target=self._warmup, name="http-warmup", daemon=True).start()
+        else:
+            self._warmup()
+
+    def start_keepalive(self):
+        # Re-warm the pool after long idle periods so the next hotkey press
+        # does not pay DNS, TCP and TLS setup again
+        if self._keepalive is not None or not self.rewarm_after:
+            return
+        self._keepalive = threading.Thread(target=self._keepalive_loop, name="http-keepalive", daemon=True)
+        self._keepalive.start()
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+
+    def _on_request(self, request):
+        self.last_used = time.monotonic()
+
+    def _on_response(self, response):
+        self.rate_limiter.update(response.headers)
+
+    def _warmup(self):
+        import httpx
+        start = time.perf_counter()
+        try:
+            # Any response will do, the point is an open, pooled connection
+            self.http_client.get(f"{self.base_url}/models")
+            logger.debug(f"Warmed up connection to {self.base_url} in {(time.perf_counter() - start) * 1000:.0f} ms")
+        except httpx.HTTPError as e:
+            logger.warning(f"Connection warmup to {self.base_url} failed: {e}")
+
+    def _keepalive_loop(self):
+        interval = max(1.0, self.rewarm_after / 4)
+        while not self._stop.wait(interval):
+            if time.monotonic() - self.last_used >= self.rewarm_after:
+                self._warmup()
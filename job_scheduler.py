@@ -0,0 +1,191 @@
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_id, hotkey, func, args, kwargs):
+        self.id = job_id
+        self.hotkey = hotkey
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.exception = None
+        self.done = threading.Event()
+        self._cancelled = threading.Event()
+        self._cancel_callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self._cancelled.set()
+            callbacks, self._cancel_callbacks = self._cancel_callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"Cancel callback for job {self.id} failed: {e}")
+
+    def on_cancel(self, callback):
+        # Register a callback (e.g. closing an HTTP stream) to run on cancel.
+        # Runs immediately if the job has already been cancelled.
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def sleep(self, seconds):
+        # Sleeps, but raises JobCancelled as soon as the job is cancelled
+        if self._cancelled.wait(seconds):
+            self.check_cancelled()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(f"Job {self.id} ({self.hotkey}) was cancelled")
+
+
+class JobScheduler:
+    """Runs hotkey jobs on a bounded worker pool so the keyboard hook thread
+    only has to enqueue and return."""
+
+    def __init__(self, max_workers=4, max_queue=32, default_limit=1):
+        self.max_queue = max_queue
+        self.default_limit = default_limit
+        self.clipboard_lock = threading.RLock()  # Serializes single clipboard operations
+        self._limits = {}
+        self._active = {}  # hotkey -> number of running jobs
+        self._pending = deque()
+        self._running = {}
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._shutdown = False
+        self._workers = []
+        for i in range(max_workers):
+            worker = threading.Thread(
+                target=self._worker, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def set_limit(self, hotkey, limit):
+        with self._cond:
+            if limit is None:
+                self._limits.pop(hotkey, None)
+            else:
+                self._limits[hotkey] = max(1, int(limit))
+            self._cond.notify_all()
+
+    def submit(self, hotkey, func, *args, **kwargs):
+        # Called from the keyboard hook thread: no I/O besides the overflow
+        # warning, just enqueue and wake a worker.
+        with self._cond:
+            if self._shutdown:
+                return None
+            if len(self._pending) >= self.max_queue:
+                logger.warning(f"Job queue is full, dropping trigger for '{hotkey}'")
+                return None
+            job = Job(next(self._ids), hotkey, func, args, kwargs)
+            self._pending.append(job)
+            self._cond.notify()
+        return job
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._pending)
+
+    def running_count(self):
+        with self._cond:
+            return len(self._running)
+
+    def jobs(self, hotkey=None):
+        with self._cond:
+            jobs = list(self._running.values()) + list(self._pending)
+        return [job for job in jobs if hotkey is None or job.hotkey == hotkey]
+
+    def pending(self, hotkey=None):
+        with self._cond:
+            return [job for job in self._pending if hotkey is None or job.hotkey == hotkey]
+
+    def cancel(self, job):
+        with self._cond:
+            try:
+                self._pending.remove(job)
+            except ValueError:
+                pass
+        job.cancel()
+
+    def cancel_hotkey(self, hotkey):
+        for job in self.jobs(hotkey):
+            self.cancel(job)
+
+    def cancel_all(self):
+        for job in self.jobs():
+            self.cancel(job)
+
+    def shutdown(self, wait=False):
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        self.cancel_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _next_runnable(self):
+        # First pending job whose hotkey is below its concurrency limit, so a
+        # busy hotkey never holds up the others.
+        for job in self._pending:
+            limit = self._limits.get(job.hotkey, self.default_limit)
+            if self._active.get(job.hotkey, 0) < limit:
+                self._pending.remove(job)
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._shutdown:
+                    job = self._next_runnable()
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if job is None:
+                    return
+                self._active[job.hotkey] = self._active.get(job.hotkey, 0) + 1
+                self._running[job.id] = job
+
+            job.started_at = time.monotonic()
+            try:
+                if not job.cancelled:
+                    job.result = job.func(job, *job.args, **job.kwargs)
+            except JobCancelled:
+                logger.info(f"Job {job.id} ({job.hotkey}) cancelled")
+            except Exception as e:
+                job.exception = e
+                logger.error(f"Job {job.id} ({job.hotkey}) failed: {e}")
+            finally:
+                job.finished_at = time.monotonic()
+                with self._cond:
+                    self._active[job.hotkey] -= 1
+                    self._running.pop(job.id, None)
+                    self._cond.notify_all()
+                job.done.set()
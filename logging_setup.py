@@ -0,0 +1,96 @@
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+
+TEXT_FORMAT = '%(asctime)s %(name)s %(levelname)s: %(message)s'
+
+# Set by the trigger pipeline for the duration of a job, so every record
+# logged on its behalf can be tied back to it
+request_id = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    # Attached to the QueueHandler, so it runs on the thread that logs the
+    # record, the only place the context variable is visible; on the
+    # listener's handlers it would always see None
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the request ID and any fields passed
+    through ``extra=`` (e.g. timings)."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None) is not None:
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _file_handler(path, log_settings):
+    # Size-based rotation unless a time interval ("midnight", "h", ...) is set
+    backup_count = log_settings.get("backup_count", 5)
+    when = log_settings.get("rotate_when")
+    if when:
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=when, backupCount=backup_count, encoding="utf-8")
+    return logging.handlers.RotatingFileHandler(
+        path, maxBytes=log_settings.get("max_bytes", 5 * 1024 * 1024),
+        backupCount=backup_count, encoding="utf-8")
+
+
+def setup_logging(log_file, settings):
+    """Send all records through a queue to a background writer thread.
+
+    Callers only pay for putting the record on the queue; formatting, file
+    writes and rotation happen on the listener thread. Returns the started
+    QueueListener, whose ``stop()`` flushes what is left on shutdown.
+    """
+    log_settings = settings.get("logging") or {}
+    handlers = []
+    text_handler = _file_handler(log_file, log_settings)
+    text_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    handlers.append(text_handler)
+    if log_settings.get("json_file"):
+        json_handler = _file_handler(log_settings["json_file"], log_settings)
+        json_handler.setFormatter(JsonFormatter())
+        handlers.append(json_handler)
+
+    queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(RequestIdFilter())
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    apply_levels(settings)
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def apply_levels(settings):
+    # The root level and per-logger overrides, e.g. {"httpx": "WARNING"};
+    # also used as a settings listener so level changes apply immediately
+    log_settings = settings.get("logging") or {}
+    logging.getLogger().setLevel(log_settings.get("level", "INFO"))
+    for name, level in (log_settings.get("levels") or {}).items():
+        logging.getLogger(name).setLevel(level)
@@ -1,140 +1,183 @@
+import time
+
+# Taken before anything heavy is imported, for the cold-start figure
+START_TIME = time.perf_counter()
+
 import logging
 import sys
-import time
-from functools import partial
+import threading
 
-import keyboard
-import openai
-import pyautogui
-import pyperclip
-from openai import OpenAI
 # Ensure PyQt6 is used if you've migrated
+from PyQt6.QtCore import QTimer
 from PyQt6.QtWidgets import QApplication, QStyle
 
-from gui.settings_dialog import SettingsDialog
+from app_dirs import user_cache_dir, user_data_dir
+from backend_pool import BackendPool
+from clipboard import ClipboardIO
 from gui.tray_icon import TrayIcon
+from history_store import HistoryStore
+from hotkey_registry import HotkeyConflictError, HotkeyRegistry
+from http_transport import ClientPool
+from job_scheduler import JobScheduler
+from logging_setup import apply_levels, setup_logging
+from metrics import metrics
+from model_policy import ModelPolicy
+from model_registry import ModelRegistry
+from response_cache import ResponseCache
 from settings_manager import SettingsManager
-from utils import get_openai_non_stream_response, get_openai_stream_response
+from single_flight import TriggerGate
+from trigger_pipeline import TriggerPipeline
 
 CONFIG_FILE = "config.json"
 PROMPTS_FILE = "defaults.json"
 LOG_FILE = "app.log"
+# Kept out of the working directory; nothing is created until first written
+CACHE_DIR = user_cache_dir() / "responses"
+HISTORY_FILE = user_data_dir() / "history.sqlite3"
+METRICS_FILE = user_cache_dir() / "metrics.jsonl"
 
-# Configure the logging module
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.DEBUG,
-    format='%(asctime)s %(name)s %(levelname)s: %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+settings = SettingsManager(config_file=CONFIG_FILE, defaults_file=PROMPTS_FILE)
+
+# Records are written by a background thread, never by the caller
+log_listener = setup_logging(LOG_FILE, settings)
+settings.add_listener(apply_levels)
+
 # Initialize the application first
 app = QApplication(sys.argv)
 app.setQuitOnLastWindowClosed(False)
 
-settings = SettingsManager(config_file=CONFIG_FILE, defaults_file=PROMPTS_FILE)
+settings.start_watching()
+app.aboutToQuit.connect(settings.flush)
+
+model_registry = ModelRegistry()
+settings.set_model_registry(model_registry)
+
+# One pooled HTTP transport for every OpenAI client the app builds. Nothing
+# is imported or connected here; the client is built on first use.
+client_pool = ClientPool.from_settings(settings)
+app.aboutToQuit.connect(client_pool.close)
+# Routes requests across the configured endpoints, on top of the shared pool
+backend_pool = BackendPool(settings, client_pool)
+app.aboutToQuit.connect(backend_pool.close)
+
+# Hotkey triggers run on a worker pool, never inside the keyboard hook
+scheduler_settings = settings.get("scheduler") or {}
+scheduler = JobScheduler(
+    max_workers=scheduler_settings.get("max_workers", 4),
+    max_queue=scheduler_settings.get("max_queue", 32),
+    default_limit=scheduler_settings.get("per_hotkey_limit", 2))
+app.aboutToQuit.connect(scheduler.shutdown)
+
+# Cheap to build: the history database is opened on its writer thread and
+# the cache directory is only created on the first write
+response_cache = ResponseCache.from_settings(CACHE_DIR, settings)
+history_store = HistoryStore.from_settings(HISTORY_FILE, settings)
+if history_store is not None:
+    app.aboutToQuit.connect(history_store.close)
+
+# Clipboard capture and paste share the scheduler's lock
+clipboard = ClipboardIO.from_settings(settings, lock=scheduler.clipboard_lock)
+pipeline = TriggerPipeline(
+    settings, backend_pool, clipboard, cache=response_cache, history=history_store,
+    policy=ModelPolicy(settings, model_registry))
+# Debounces repeated presses before they reach the scheduler
+trigger_gate = TriggerGate(scheduler, settings)
+
+
+def create_settings_dialog():
+    # Imported and built on first use so it stays off the startup path
+    from gui.settings_dialog import SettingsDialog
+    return SettingsDialog(
+        client_pool.client, settings, cache=response_cache, model_registry=model_registry,
+        client_pool=client_pool, history=history_store)
 
-api_key = settings.get("api_key")
-model = settings.get("model")
-user_prompts = settings.get("hotkeys") or {}
 
-# Initialize the OpenAI client only if api_key is available
-client = None
-if api_key:
-    try:
-        client = OpenAI(api_key=api_key)
-        # Now that we have the client, set it in the settings manager
-        settings.set_client(client)
-    except openai.AuthenticationError as e:
-        logger.error(f"Invalid API key: {e}")
-
-# Initialize the settings dialog and tray icon after QApplication
-settings_dialog = SettingsDialog(client, settings)
 style = app.style()
 assert style is not None
 tray_icon = TrayIcon(
     style.standardIcon(QStyle.StandardPixmap.SP_DesktopIcon),
-    settings_dialog,
-    app)
-
-# Function to handle the key combination event
-def on_triggered(prompt):
-    time.sleep(0.5)
-    original_clipboard = pyperclip.paste()
-    max_tokens = settings.get("max_tokens")
-    stream = settings.get("stream", False)
-    try:
-        pyautogui.hotkey("ctrl", "c")
-        time.sleep(0.2)
-        highlighted_text = pyperclip.paste()
-        if not highlighted_text.strip():
-            logger.warning("No text highlighted.")
-            return
-
-        messages = [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": highlighted_text}
-        ]
-
-        if stream:
-            response_generator = get_openai_stream_response(
-                client, messages=messages, max_tokens=max_tokens, model=model)
-            for content in response_generator:
-                pyperclip.copy(content)
-                pyautogui.hotkey("ctrl", "v")
-                time.sleep(0.2)
-        else:
-            response = get_openai_non_stream_response(
-                client, messages=messages, max_tokens=max_tokens, model=model)
-            pyperclip.copy(response)
-            pyautogui.hotkey("ctrl", "v")
-            time.sleep(0.2)
-
-        pyperclip.copy(original_clipboard)
+    create_settings_dialog,
+    app,
+    scheduler=scheduler)
+# Rejected triggers are reported as tray notifications
+pipeline.notify = tray_icon.notify
 
-    except Exception as e:
-        logger.error(f"An error occurred: {e}")
-        if original_clipboard is not None:
-            pyperclip.copy(original_clipboard)
 
-# Show the settings dialog on application start
-settings_dialog.show()
+def on_hotkey(action):
+    # Runs on the keyboard hook thread; the prompt is looked up when the job runs
+    trigger_gate.submit(action, pipeline.on_triggered)
 
-# Start the tray service
-tray_icon.show()
 
-logger.info(f"User prompts loaded: {user_prompts}")
-
-# Check for duplicate key combinations in user_prompts
-key_combos = [
-    hotkey_info["key_combo"] for _,
-    hotkey_info in user_prompts.items() if isinstance(
-        hotkey_info,
-        dict)]
-if len(key_combos) != len(set(key_combos)):
-    logger.warning(
-        "Duplicate key combinations found in the configuration. Some hotkeys may not work as expected.")
-
-logger.debug("Registering hotkeys...")
-
-# Listen for the key combinations using user_prompts
-for action, hotkey_info in user_prompts.items():
-    logger.debug(f"Processing action: {action}")
-    if isinstance(hotkey_info, dict):
-        key_combo = hotkey_info.get("key_combo")
-        # Default to empty string if not found
-        prompt = hotkey_info.get("prompt", "")
-        logger.debug(f"Attempting to register hotkey {key_combo} for action '{action}' with prompt '{prompt}'")
-        if key_combo is not None and prompt is not None:  # Check for None instead of falsiness
-            try:
-                keyboard.add_hotkey(key_combo, partial(on_triggered, prompt))
-                logger.info(
-                    f"Registered hotkey {key_combo} for action '{action}'")
-            except Exception as e:
-                logger.error(f"Failed to register hotkey {key_combo} for action '{action}': {e}")
-        else:
-            logger.error(
-                f"Missing 'key_combo' or 'prompt' for action '{action}'")
+hotkey_registry = HotkeyRegistry(on_hotkey)
+
+
+def apply_hotkeys(settings):
+    # Runs at startup and on every settings change (edits on disk, imported
+    # configs); only combos that changed are re-registered
+    user_prompts = settings.get("hotkeys") or {}
+    for action, hotkey_info in user_prompts.items():
+        if isinstance(hotkey_info, dict):
+            scheduler.set_limit(action, hotkey_info.get("max_concurrent"))
+    try:
+        hotkey_registry.apply(user_prompts)
+    except HotkeyConflictError as e:
+        logger.error(f"{e}. Keeping the previous hotkeys.")
+
+
+def warm_up():
+    # Runs on a background thread once the tray is usable: load the heavy
+    # modules and open a connection before the first hotkey press needs them
+    started = time.perf_counter()
+    try:
+        clipboard.load_backends()
+        api_key = settings.get("api_key")
+        if api_key:
+            client = client_pool.get(api_key)
+            if (settings.get("http") or {}).get("warmup", True):
+                client_pool.warmup(background=False)
+                client_pool.start_keepalive()
+            # Refresh the model list in the background if the cache is stale
+            model_registry.refresh_async(client)
+        backend_pool.warmup()
+    except Exception as e:
+        logger.error(f"Background warm-up failed: {e}")
+        return
+    metrics.observe("startup.warm_up", time.perf_counter() - started)
+    logger.info(f"Background warm-up finished in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+def on_event_loop_started():
+    tray_ready = time.perf_counter() - START_TIME
+    metrics.observe("startup.cold_start", tray_ready)
+    logger.info(f"Tray ready {tray_ready * 1000:.0f} ms after start")
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    # Show the settings dialog on application start
+    tray_icon.show_settings_dialog()
+
+
+# Export the per-stage timings
+metrics_settings = settings.get("metrics") or {}
+if metrics_settings.get("export_interval"):
+    metrics.start_file_export(
+        METRICS_FILE,
+        interval=metrics_settings["export_interval"],
+        max_bytes=metrics_settings.get("max_file_bytes", 1024 * 1024))
+if metrics_settings.get("prometheus_port"):
+    try:
+        metrics.start_http_server(metrics_settings["prometheus_port"])
+    except OSError as e:
+        logger.error(f"Could not start the metrics endpoint: {e}")
+app.aboutToQuit.connect(metrics.stop)
+# Last, so records logged while shutting down are still written
+app.aboutToQuit.connect(log_listener.stop)
+
+# Hotkeys and the tray come first; everything else waits for the event loop
+apply_hotkeys(settings)
+settings.add_listener(apply_hotkeys)
+tray_icon.show()
+QTimer.singleShot(0, on_event_loop_started)
 
 logger.info("Service running... Press CTRL+R after highlighting text.")
 
@@ -0,0 +1,176 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    # Keeps the most recent samples for percentiles plus lifetime count/sum
+    def __init__(self, unit="s", max_samples=1024):
+        self.unit = unit
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, p):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+        return ordered[index]
+
+    def snapshot(self):
+        return {
+            "unit": self.unit,
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+        }
+
+
+class Metrics:
+    """In-process histograms and counters for the trigger pipeline.
+
+    Durations are recorded in seconds; token and chunk counts are observed
+    with ``unit="count"``. Names are dotted stage names such as
+    ``request.ttft``.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def observe(self, name, value, unit="s"):
+        if value is None:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(unit)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def summary(self):
+        with self._lock:
+            return {name: histogram.snapshot() for name, histogram in sorted(self._histograms.items())}
+
+    def counters(self):
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+    def prometheus_text(self):
+        lines = []
+        for name, snapshot in self.summary().items():
+            metric = "tibikey_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+            lines.append(f"# TYPE {metric} summary")
+            for quantile, key in (("0.5", "p50"), ("0.95", "p95")):
+                if snapshot[key] is not None:
+                    lines.append(f'{metric}{{quantile="{quantile}"}} {snapshot[key]}')
+            lines.append(f"{metric}_sum {snapshot['sum']}")
+            lines.append(f"{metric}_count {snapshot['count']}")
+        for name, value in self.counters().items():
+            metric = "tibikey_" + re.sub(r"[^a-zA-Z0-9_]", "_", name) + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def start_file_export(self, path, interval=60.0, max_bytes=1024 * 1024):
+        # Appends one JSON snapshot per interval; the file rolls over to
+        # <path>.1 once it grows past max_bytes
+        threading.Thread(
+            target=self._export_loop, args=(path, interval, max_bytes),
+            name="metrics-export", daemon=True).start()
+
+    def start_http_server(self, port, host="127.0.0.1"):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+        return server
+
+    def stop(self):
+        self._stop.set()
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def write_snapshot(self, path, max_bytes=1024 * 1024):
+        record = {"time": time.time(), "histograms": self.summary(), "counters": self.counters()}
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) > max_bytes:
+                os.replace(path, f"{path}.1")
+            with open(path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {path}: {e}")
+
+    def _export_loop(self, path, interval, max_bytes):
+        while not self._stop.wait(interval):
+            self.write_snapshot(path, max_bytes)
+
+
+# Process-wide registry, shared the same way as the logging module's loggers
+metrics = Metrics()
+
+
+def trace_connection(request):
+    # httpx event hook: attach an httpcore trace callback that records how
+    # long TCP connect and TLS setup take when a new connection is opened
+    started = {}
+
+    def trace(event, info):
+        if event.endswith(".started"):
+            started[event[:-len(".started")]] = time.perf_counter()
+        elif event.endswith(".complete"):
+            name = event[:-len(".complete")]
+            if name in ("connection.connect_tcp", "connection.start_tls") and name in started:
+                metrics.observe(f"http.{name.split('.')[-1]}", time.perf_counter() - started[name])
+
+    request.extensions["trace"] = trace
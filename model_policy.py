@@ -0,0 +1,74 @@
+import logging
+import math
+
+from chunking import estimate_tokens
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ModelPolicy:
+    """Picks the model and output budget for a trigger from its hotkey's
+    "policy" and the size of the selection.
+
+    A policy is a list of tiers tried in order; the first whose
+    ``max_chars`` fits the selection (or that has none) wins::
+
+        "policy": {
+            "tiers": [
+                {"max_chars": 600, "model": "gpt-4o-mini"},
+                {"model": "gpt-4o"}
+            ],
+            "output_ratio": 1.3,
+            "min_tokens": 32
+        }
+
+    With ``output_ratio`` set, max_tokens is the estimated input tokens
+    times the ratio plus ``min_tokens``, clamped to allowed_tokens_range;
+    tiers may override both. Tier models are only used once the cached model
+    list is known to contain them; otherwise the global model is. Hotkeys without a policy use the global
+    model and max_tokens.
+    """
+
+    def __init__(self, settings, model_registry=None):
+        self.settings = settings
+        self.model_registry = model_registry
+
+    def select(self, hotkey_info, text):
+        model = self.settings.get("model")
+        max_tokens = self.settings.get("max_tokens")
+        policy = hotkey_info.get("policy")
+        if not policy:
+            return model, max_tokens
+
+        tier = next(
+            (tier for tier in policy.get("tiers", [])
+             if tier.get("max_chars") is None or len(text) <= tier["max_chars"]), {})
+        model = self._validated(tier.get("model"), model)
+
+        ratio = tier.get("output_ratio", policy.get("output_ratio"))
+        if ratio:
+            low, high = self.settings.get("allowed_tokens_range", [1, 4096])
+            wanted = math.ceil(estimate_tokens(text) * ratio) + tier.get(
+                "min_tokens", policy.get("min_tokens", 0))
+            max_tokens = min(max(wanted, low), high)
+        elif tier.get("max_tokens"):
+            max_tokens = tier["max_tokens"]
+
+        metrics.inc(f"policy.{model}")
+        logger.debug(f"Policy picked {model} with max_tokens={max_tokens} for {len(text)} characters")
+        return model, max_tokens
+
+    def _validated(self, model, fallback):
+        if not model:
+            return fallback
+        registry = self.model_registry
+        # Only models the backend is known to serve; until the list has been
+        # fetched, or on backends without it, the global model is the safe bet
+        if registry is None or not registry.is_known():
+            logger.debug(f"Model list unknown, using {fallback} instead of {model}")
+            return fallback
+        if model not in registry:
+            logger.warning(f"Policy model {model} is not available, using {fallback}")
+            return fallback
+        return model
@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from app_dirs import user_cache_dir
+from utils import get_openai_models
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """Timestamped, set-indexed cache of the available models.
+
+    Lookups never touch the network; ``refresh_async`` fetches the list on a
+    worker thread and reports back through listeners.
+    """
+
+    def __init__(self, cache_file=None, ttl=24 * 3600):
+        self.cache_file = Path(cache_file) if cache_file else user_cache_dir() / "models.json"
+        self.ttl = ttl
+        self.fetched_at = 0.0
+        self._models = []
+        self._index = frozenset()
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._listeners = []
+        self._load()
+
+    def __contains__(self, model):
+        return model in self._index
+
+    def models(self):
+        return list(self._models)
+
+    def is_known(self):
+        return bool(self._index)
+
+    def is_stale(self):
+        return time.time() - self.fetched_at > self.ttl
+
+    def add_listener(self, callback):
+        # Called as callback(models, error) from the refresh thread
+        self._listeners.append(callback)
+
+    def refresh_async(self, client, force=False):
+        if client is None or not (force or self.is_stale()):
+            return False
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+        threading.Thread(
+            target=self._refresh, args=(client,), name="model-refresh", daemon=True).start()
+        return True
+
+    def refresh(self, client):
+        # Blocking refresh, for callers that already run off the GUI thread
+        models = get_openai_models(client)
+        if models:
+            self._update(models, time.time())
+            self._save()
+        return models
+
+    def _refresh(self, client):
+        models, error = [], None
+        try:
+            models = self.refresh(client)
+        except Exception as e:
+            error = e
+            logger.error(f"Model refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+        for callback in list(self._listeners):
+            try:
+                callback(models, error)
+            except Exception as e:
+                logger.error(f"Model registry listener failed: {e}")
+
+    def _update(self, models, fetched_at):
+        models = sorted(set(models))
+        with self._lock:
+            self._models = models
+            self._index = frozenset(models)
+            self.fetched_at = fetched_at
+
+    def _load(self):
+        if not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable model cache {self.cache_file}: {e}")
+            return
+        if isinstance(data, list):
+            # Old plain-list cache without a timestamp: usable but stale
+            self._update(data, 0.0)
+        else:
+            self._update(data.get("models", []), data.get("fetched_at", 0.0))
+
+    def _save(self):
+        with self._lock:
+            data = {"fetched_at": self.fetched_at, "models": self._models}
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.cache_file.parent, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.cache_file)
+        except OSError as e:
+            logger.warning(f"Could not write model cache {self.cache_file}: {e}")
@@ -0,0 +1,93 @@
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# A delta ending a sentence or a line is a natural point to paste
+SENTENCE_END = re.compile(r"""([.!?…:;]["')\]]*|\n)\s*$""")
+
+
+class PasteSink:
+    """Buffers streamed deltas and pastes them in batches.
+
+    A flush happens when the buffer reaches ``max_chars``, when ``interval``
+    has passed since the last flush, or at a sentence end. Both windows grow
+    with the measured paste cost so pasting never dominates the stream.
+    """
+
+    def __init__(self, paste, interval=0.15, max_chars=200,
+                 max_interval=1.0, cost_factor=2.0):
+        self._paste = paste
+        self.base_interval = interval
+        self.interval = interval
+        self.base_max_chars = max_chars
+        self.max_chars = max_chars
+        self.max_interval = max(max_interval, interval)
+        self.cost_factor = cost_factor
+        self.paste_cost = None  # EWMA of seconds per paste
+        self.paste_time = 0.0  # Total seconds spent pasting
+        self.flushes = 0
+        self.chars = 0
+        self._buffer = []
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+
+    @classmethod
+    def from_settings(cls, paste, settings):
+        paste_settings = settings.get("paste") or {}
+        return cls(
+            paste,
+            interval=paste_settings.get("flush_interval_ms", 150) / 1000,
+            max_chars=paste_settings.get("flush_chars", 200),
+            max_interval=paste_settings.get("max_flush_interval_ms", 1000) / 1000)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Only paste the remainder if the stream finished normally
+        if exc_type is None:
+            self.flush()
+        return False
+
+    def write(self, text):
+        if not text:
+            return
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if (self._buffered >= self.max_chars
+                or time.monotonic() - self._last_flush >= self.interval
+                or SENTENCE_END.search(text)):
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        self._buffered = 0
+
+        start = time.monotonic()
+        self._paste(text)
+        end = time.monotonic()
+        self._last_flush = end
+        self.paste_time += end - start
+        self.flushes += 1
+        self.chars += len(text)
+        self._adapt(end - start)
+
+    def _adapt(self, cost):
+        if self.paste_cost is None:
+            self.paste_cost = cost
+        else:
+            self.paste_cost = 0.7 * self.paste_cost + 0.3 * cost
+        self.interval = min(
+            self.max_interval,
+            max(self.base_interval, self.cost_factor * self.paste_cost))
+        # Grow the size window with the time window, so a burst of buffered
+        # text is not pasted in many small, expensive pieces
+        self.max_chars = int(self.base_max_chars * self.interval / self.base_interval)
+        logger.debug(
+            f"Pasted {self.chars} chars in {self.flushes} flushes, "
+            f"paste cost {self.paste_cost * 1000:.0f} ms, window {self.interval * 1000:.0f} ms")
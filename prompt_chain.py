@@ -0,0 +1,142 @@
+import contextvars
+import logging
+import queue
+import threading
+
+from chunking import PARAGRAPH_BREAK
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def pipeline_stages(hotkeys, action):
+    """Resolves a pipeline hotkey's "pipeline" list of action names to the
+    hotkey settings of each stage, in order::
+
+        "proofread_and_check": {
+            "key_combo": "ctrl+shift+p",
+            "name": "Proofread, then Fact-Check",
+            "pipeline": ["proofread", "fact_check"]
+        }
+
+    Raises ValueError unless every stage is an existing prompt hotkey.
+    """
+    names = (hotkeys.get(action) or {}).get("pipeline")
+    if not isinstance(names, list) or not names:
+        raise ValueError(f"Pipeline '{action}' has no stages")
+    stages = []
+    for name in names:
+        stage = hotkeys.get(name)
+        if not isinstance(stage, dict) or stage.get("prompt") is None or "pipeline" in stage:
+            raise ValueError(f"Pipeline '{action}' stage '{name}' is not a prompt hotkey")
+        stages.append(stage)
+    return stages
+
+
+def paragraphs(deltas, separator=""):
+    """Regroups a stream of deltas into (paragraph, separator) pairs, each
+    yielded as soon as the blank line after it has arrived. The last
+    paragraph gets ``separator``."""
+    buffer = ""
+    for delta in deltas:
+        buffer += delta
+        while True:
+            match = PARAGRAPH_BREAK.search(buffer)
+            # A break at the very end may still grow with the next delta
+            if match is None or match.end() == len(buffer):
+                break
+            yield buffer[:match.start()], match.group()
+            buffer = buffer[match.end():]
+    # Only a break at the very end can be left; it gives way to ``separator``
+    match = PARAGRAPH_BREAK.search(buffer)
+    if match is not None:
+        buffer = buffer[:match.start()]
+    if buffer or separator:
+        yield buffer, separator
+
+
+def _rstripped(deltas):
+    # Holds back trailing whitespace until more text follows, so an answer
+    # ending in a blank line does not double the separator after it
+    pending = ""
+    for delta in deltas:
+        text = pending + delta
+        stripped = text.rstrip()
+        pending = text[len(stripped):]
+        if stripped:
+            yield stripped
+
+
+def chain_stream(chunks, stages):
+    """Runs the [(chunk, separator), ...] of a selection through ``stages``
+    in order and yields the deltas of the last one. Each stage is a
+    callable taking text and returning a delta iterator.
+
+    The first stage gets the chunks one by one. Every later stage gets the
+    output of the one before it paragraph by paragraph, on its own thread,
+    so it starts on the first paragraph while the previous stage is still
+    writing the rest. Separators of the input are kept between the final
+    outputs.
+    """
+    stop = threading.Event()
+    feeds = [queue.Queue() for _ in stages]
+    for chunk in chunks:
+        feeds[0].put(chunk)
+    feeds[0].put(_DONE)
+
+    def items(feed):
+        while True:
+            item = feed.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def run_stage(stage, feed, output):
+        try:
+            for paragraph, separator in items(feed):
+                if stop.is_set():
+                    return
+                if not paragraph.strip():
+                    # Nothing for the model to do with blank lines
+                    output.put((paragraph, separator))
+                    continue
+                deltas = stage(paragraph)
+                try:
+                    for item in paragraphs(deltas, separator):
+                        if stop.is_set():
+                            return
+                        output.put(item)
+                finally:
+                    if hasattr(deltas, "close"):
+                        deltas.close()
+        except BaseException as e:
+            output.put(e)
+        finally:
+            output.put(_DONE)
+
+    for index, stage in enumerate(stages[:-1]):
+        # Each stage keeps the caller's context (e.g. its request ID)
+        threading.Thread(
+            target=contextvars.copy_context().run, args=(run_stage, stage, feeds[index], feeds[index + 1]),
+            name=f"chain-stage-{index}", daemon=True).start()
+
+    try:
+        # The last stage runs in the caller, so its deltas reach it live
+        for paragraph, separator in items(feeds[-1]):
+            if paragraph.strip():
+                deltas = stages[-1](paragraph)
+                try:
+                    yield from _rstripped(deltas)
+                finally:
+                    if hasattr(deltas, "close"):
+                        deltas.close()
+            else:
+                yield paragraph
+            if separator:
+                yield separator
+    finally:
+        # Also runs when the consumer stops early (e.g. a cancelled job)
+        stop.set()
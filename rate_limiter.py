@@ -0,0 +1,175 @@
+import heapq
+import itertools
+import logging
+import random
+import re
+import threading
+import time
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first: hotkeys pre-empt background and batch work
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value):
+    # Rate limit reset headers look like "1s", "6m0s" or "20ms"
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def is_transient(error):
+    # Rate limits, server errors and network failures say something about
+    # the endpoint; other errors (400, 401, 404, ...) are the request's fault
+    import openai
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, openai.APIConnectionError)
+
+
+class TokenBucket:
+    # Refills continuously to ``capacity`` per minute; no capacity means no limit
+    def __init__(self, capacity=None):
+        self.capacity = capacity
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now):
+        if self.capacity:
+            self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    def wait_time(self, amount):
+        if not self.capacity:
+            return 0.0
+        # A request bigger than the whole bucket waits for a full one
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * 60 / self.capacity)
+
+    def take(self, amount):
+        if self.capacity:
+            self.level -= min(amount, self.capacity)
+
+    def sync(self, limit, remaining):
+        if limit:
+            self.capacity = limit
+        if remaining is not None and self.capacity:
+            self.level = min(self.capacity, remaining)
+
+
+class RateLimiter:
+    """Admission control for one API account: request and token buckets
+    sized to its per-minute limits, kept in sync with the server's
+    ``x-ratelimit-*`` response headers.
+
+    Callers wait in ``acquire()`` in priority order, so a queued batch never
+    holds up a hotkey. After a 429 every caller is held back for the
+    Retry-After period instead of each one retrying on its own.
+    """
+
+    def __init__(self, rpm=None, tpm=None, max_retries=3, backoff_base=0.5, backoff_max=20.0):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._paused_until = 0.0
+        self._waiters = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_settings(cls, settings, limits=None):
+        # ``limits`` holds "rpm"/"tpm" for endpoints other than the default
+        rate_settings = settings.get("rate_limit") or {}
+        limits = rate_settings if limits is None else limits
+        return cls(
+            rpm=limits.get("rpm"),
+            tpm=limits.get("tpm"),
+            max_retries=rate_settings.get("max_retries", 3),
+            backoff_base=rate_settings.get("backoff_base_ms", 500) / 1000,
+            backoff_max=rate_settings.get("backoff_max_ms", 20000) / 1000)
+
+    def acquire(self, tokens, priority=PRIORITY_INTERACTIVE, job=None):
+        started = time.monotonic()
+        with self._cond:
+            entry = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    if job is not None:
+                        job.check_cancelled()
+                    delay = 0.25  # Also how often a waiting job checks for cancellation
+                    if self._waiters[0] == entry:
+                        now = time.monotonic()
+                        self.requests.refill(now)
+                        self.tokens.refill(now)
+                        delay = max(self._paused_until - now, self.requests.wait_time(1),
+                                    self.tokens.wait_time(tokens))
+                        if delay <= 0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            break
+                    self._cond.wait(min(delay, 0.25))
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+        waited = time.monotonic() - started
+        if waited > 0.01:
+            metrics.observe("request.admission_wait", waited)
+
+    def update(self, headers):
+        # Called with every response's headers
+        def number(name):
+            value = headers.get(name)
+            try:
+                return int(value) if value is not None else None
+            except ValueError:
+                return None
+
+        with self._cond:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            self.requests.sync(number("x-ratelimit-limit-requests"), number("x-ratelimit-remaining-requests"))
+            self.tokens.sync(number("x-ratelimit-limit-tokens"), number("x-ratelimit-remaining-tokens"))
+
+    def pause(self, seconds):
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def retry_delay(self, error, retries):
+        # Seconds to wait before retrying a failed request, or None if it
+        # should not be retried
+        if retries >= self.max_retries or not is_transient(error):
+            return None
+        status = getattr(error, "status_code", None)
+
+        # Full jitter, so simultaneous failures do not retry in lockstep
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** retries))
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after = parse_duration(response.headers.get("retry-after-ms"))
+            retry_after = retry_after / 1000 if retry_after is not None else (
+                parse_duration(response.headers.get("retry-after")))
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, self.backoff_max))
+        if status == 429:
+            self.pause(delay)
+        return delay
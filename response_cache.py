@@ -0,0 +1,174 @@
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + on-disk) cache of completed responses, keyed on
+    a hash of model, system prompt, selected text and max_tokens.
+
+    Both tiers are bounded by bytes, since one long answer can weigh as much
+    as thousands of short ones. Answers longer than ``max_entry_chars`` are
+    not cached at all.
+    """
+
+    EVICT_EVERY = 16  # Disk eviction pass every N writes
+
+    def __init__(self, directory, max_memory_bytes=16 * 1024 * 1024,
+                 max_disk_bytes=50 * 1024 * 1024, ttl=7 * 24 * 3600, max_entry_chars=None):
+        self.directory = Path(directory)
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.max_entry_chars = max_entry_chars
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # key -> (created, text)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._writes = 0
+        # The directory is created on the first write; scanning a big cache
+        # directory should not hold up startup either
+        threading.Thread(target=self._evict_disk, name="cache-evict", daemon=True).start()
+
+    @classmethod
+    def from_settings(cls, directory, settings):
+        cache_settings = settings.get("cache") or {}
+        if not cache_settings.get("enabled", True):
+            return None
+        return cls(
+            directory,
+            max_memory_bytes=int(cache_settings.get("max_memory_mb", 16) * 1024 * 1024),
+            max_disk_bytes=int(cache_settings.get("max_disk_mb", 50) * 1024 * 1024),
+            ttl=cache_settings.get("ttl_hours", 168) * 3600,
+            max_entry_chars=(settings.get("limits") or {}).get("max_response_chars"))
+
+    @staticmethod
+    def make_key(model, system_prompt, text, max_tokens):
+        payload = json.dumps([model, system_prompt, text, max_tokens], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def key_for(self, model, messages, max_tokens):
+        system_prompt = "".join(m["content"] for m in messages if m["role"] == "system")
+        text = "".join(m["content"] for m in messages if m["role"] == "user")
+        return self.make_key(model, system_prompt, text, max_tokens)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._forget(key)
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, entry)
+        return entry[1]
+
+    def accepts(self, length):
+        return not self.max_entry_chars or length <= self.max_entry_chars
+
+    def put(self, key, text):
+        if not text or not self.accepts(len(text)):
+            return
+        entry = (time.time(), text)
+        with self._lock:
+            self._remember(key, entry)
+            self._writes += 1
+            evict = self._writes % self.EVICT_EVERY == 0
+        self._write_disk(key, entry)
+        if evict:
+            self._evict_disk()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self.hits = self.misses = 0
+        for path in self.directory.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._memory)}
+
+    def _remember(self, key, entry):
+        self._forget(key)
+        size = sys.getsizeof(entry[1])
+        if size > self.max_memory_bytes:
+            return  # Would push out everything else; served from disk instead
+        self._memory[key] = entry
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, text) = self._memory.popitem(last=False)
+            self._memory_bytes -= sys.getsizeof(text)
+
+    def _forget(self, key):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= sys.getsizeof(entry[1])
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def _read_disk(self, key, now):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable cache entry {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        if now - data["created"] > self.ttl:
+            path.unlink(missing_ok=True)
+            return None
+        return data["created"], data["text"]
+
+    def _write_disk(self, key, entry):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"created": entry[0], "text": entry[1]}, f, ensure_ascii=False)
+            os.replace(tmp, self._path(key))
+        except OSError as e:
+            logger.warning(f"Could not write cache entry: {e}")
+
+    def _evict_disk(self):
+        now = time.time()
+        files = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+            else:
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files, key=lambda f: f[0]):
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -1,88 +1,217 @@
+import copy
 import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
 from utils import validate_model
 
+logger = logging.getLogger(__name__)
+
 
 class SettingsManager:
-    def __init__(self, config_file, defaults_file):
+    def __init__(self, config_file, defaults_file, save_delay=0.5):
         self.config_file = Path(config_file)
         self.defaults_file = Path(defaults_file) if defaults_file else None
-        self.client = None  # Store the client object
+        self.model_registry = None  # Used to validate model changes
+        self.save_delay = save_delay  # Debounce window for writes, in seconds
+        self.defaults = {}
         self.settings = {}
         self.user_settings = {}  # Store only user-modified settings
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._dirty = False
+        self._save_timer = None
+        self._config_mtime = None
+        self._listeners = []
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self.load_defaults()
         self.load()
 
-    def load(self, config_file=None):
-        # Load defaults first, if available
+    def load_defaults(self):
+        # Defaults are parsed once and kept in memory
+        self.defaults = {}
         if self.defaults_file and self.defaults_file.exists():
             with open(self.defaults_file) as f:
-                self.settings = json.load(f)
+                self.defaults = json.load(f)
 
-        # Override with user settings
-        config_file = config_file or self.config_file
+    def load(self, config_file=None):
+        imported = config_file is not None
+        config_file = Path(config_file) if imported else self.config_file
+        mtime = self._current_mtime()
+        user_settings = {}
         if config_file.exists():
             with open(config_file) as f:
-                self.user_settings = json.load(f)
-                # Remove settings from user_settings if they are the same as
-                # the defaults
-                for key in self.user_settings:  # Use list to avoid RuntimeError for changing dict size during iteration
-                    if key in self.settings and self.user_settings[key] == self.settings[key]:
-                        self.user_settings.pop(key)
-                # Merge remaining user settings over defaults
-                self.settings.update(self.user_settings)
+                user_settings = json.load(f)
+
+        with self._lock:
+            # Drop settings that are the same as the defaults
+            self.user_settings = {
+                key: value for key, value in user_settings.items()
+                if key not in self.defaults or self.defaults[key] != value}
+            # Merge remaining user settings over defaults
+            self.settings = copy.deepcopy(self.defaults)
+            self.settings.update(copy.deepcopy(self.user_settings))
+            if not imported:
+                self._config_mtime = mtime
+        if imported:
+            # An imported config becomes the user's config
+            self._schedule_save()
+        self._notify()
 
     def get(self, key, default=None):
         return self.settings.get(key, default)
 
     def set(self, key, value):
 
-        # Validate the model if the key is 'model' and the client is set
-        if key == "model" and self.client is not None:
-            validate_model(value, self.client)
-
-        # Load default settings to compare
-        default_settings = {}
-        if self.defaults_file and self.defaults_file.exists():
-            with open(self.defaults_file) as f:
-                default_settings = json.load(f)
-
-        # Check if the value is different from the default
-        if key not in default_settings or default_settings[key] != value:
-            self.user_settings[key] = value
-            # Update the current settings as well
-            self.settings[key] = value
-        else:
-            # If the value is the same as the default, remove it from
-            # user_settings
-            self.user_settings.pop(key, None)
-            # Ensure the current settings has the default value
-            if key in default_settings:
-                self.settings[key] = default_settings[key]
+        # Validate the model if the key is 'model' and the registry is set
+        if key == "model" and self.model_registry is not None:
+            validate_model(value, self.model_registry)
+
+        with self._lock:
+            # Check if the value is different from the default
+            if key not in self.defaults or self.defaults[key] != value:
+                self.user_settings[key] = value
+                # Update the current settings as well
+                self.settings[key] = value
+            else:
+                # If the value is the same as the default, remove it from
+                # user_settings
+                self.user_settings.pop(key, None)
+                # Ensure the current settings has the default value
+                self.settings[key] = copy.deepcopy(self.defaults[key])
 
         # Save only the user_settings to the config file
-        self.save()
-
-    def set_client(self, client):
-        self.client = client
+        self._schedule_save()
+        with self._lock:
+            notify = self._batch_depth == 0
+        if notify:
+            self._notify()
+
+    def update(self, values):
+        with self.batch():
+            for key, value in values.items():
+                self.set(key, value)
+
+    @contextmanager
+    def batch(self):
+        # Apply many settings and write the config file once at the end
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                pending = self._batch_depth == 0 and self._dirty
+            if pending:
+                self._schedule_save()
+                self._notify()
+
+    def set_model_registry(self, model_registry):
+        self.model_registry = model_registry
+
+    def add_listener(self, callback):
+        # Called with this manager after settings change: (re)loads, imports
+        # and sets, once per batch. Listeners may run on the watcher thread.
+        self._listeners.append(callback)
 
     def save(self):
-        # Write only the user_settings to the config file
-        with open(self.config_file, "w") as f:
-            json.dump(self.user_settings, f, indent=4)
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            self._dirty = False
+            data = json.dumps(self.user_settings, indent=4)
+            # Write to a temp file next to the config and rename it over the
+            # original, so a crash never leaves a truncated config behind
+            directory = self.config_file.parent
+            fd, tmp = tempfile.mkstemp(
+                dir=directory, prefix=f".{self.config_file.name}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.config_file)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+            self._config_mtime = self._current_mtime()
+
+    def flush(self):
+        # Write any pending debounced changes right away
+        with self._lock:
+            pending = self._dirty
+        if pending:
+            self.save()
 
     def reset(self):
-        self.settings = {}
+        with self._lock:
+            self.user_settings = {}
+            self.settings = copy.deepcopy(self.defaults)
         self.save()
-
-    def save_models_to_cache(self, models):
-        cache_file = "models_cache.json"
-        with open(cache_file, "w") as f:
-            json.dump(models, f)
-
-    def load_models_from_cache(self):
-        cache_file = "models_cache.json"
-        if Path(cache_file).exists():
-            with open(cache_file, "r") as f:
-                return json.load(f)
-        return []
\ No newline at end of file
+        self._notify()
+
+    def start_watching(self, interval=1.0):
+        # Pick up edits made to the config file on disk without a restart
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(interval,), name="settings-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+        self._watcher = None
+
+    def _watch(self, interval):
+        while not self._stop_watching.wait(interval):
+            mtime = self._current_mtime()
+            with self._lock:
+                changed = mtime != self._config_mtime and not self._dirty
+            if changed:
+                logger.info(f"{self.config_file} changed on disk, reloading settings")
+                try:
+                    self.load()
+                except (OSError, ValueError) as e:
+                    # Most likely caught mid-write by an editor; retry next tick
+                    logger.warning(f"Could not reload {self.config_file}: {e}")
+
+    def _schedule_save(self):
+        with self._lock:
+            self._dirty = True
+            if self._batch_depth > 0:
+                return
+            if self.save_delay <= 0:
+                self.save()
+                return
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(self.save_delay, self._save_pending)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _save_pending(self):
+        try:
+            self.flush()
+        except OSError as e:
+            logger.error(f"Could not save settings to {self.config_file}: {e}")
+
+    def _current_mtime(self):
+        try:
+            return self.config_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _notify(self):
+        for callback in list(self._listeners):
+            try:
+                callback(self)
+            except Exception as e:
+                logger.error(f"Settings listener failed: {e}")
@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    def __init__(self, job):
+        self.job = job
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time. Callers that arrive while a
+    call for the same key is in flight wait for it and share its outcome
+    instead of starting their own."""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, job=None):
+        # Returns (result, shared); shared is True for callers that attached
+        # to someone else's call
+        with self._lock:
+            flight = self._flights.get(key)
+            # A cancelled (e.g. superseded) leader is not worth waiting for
+            leader = flight is None or (flight.job is not None and flight.job.cancelled)
+            if leader:
+                flight = self._flights[key] = _Flight(job)
+
+        if not leader:
+            # Poll so that cancelling the waiting job still takes effect
+            while not flight.done.wait(0.1):
+                if job is not None:
+                    job.check_cancelled()
+            if flight.exception is not None:
+                raise flight.exception
+            return flight.result, True
+
+        try:
+            flight.result = func()
+        except BaseException as e:
+            flight.exception = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+
+class TriggerGate:
+    """Sits between the keyboard hook and the scheduler and drops repeated
+    presses: key auto-repeat and double presses within the debounce window,
+    and presses made while the same hotkey already has a job waiting to run
+    (that job will capture the same selection). A press made while a job is
+    running gets a job of its own, which captures the selection and shares
+    the running request if the text is the same. Hotkeys with "supersede"
+    set cancel their in-flight job instead.
+
+    Runs on the keyboard hook thread, so it must stay cheap.
+    """
+
+    def __init__(self, scheduler, settings):
+        self.scheduler = scheduler
+        self.settings = settings
+        self._last_press = {}
+        self._lock = threading.Lock()
+
+    def submit(self, hotkey, func, *args):
+        now = time.monotonic()
+        debounce = (self.settings.get("single_flight") or {}).get("debounce_ms", 300) / 1000
+        with self._lock:
+            last = self._last_press.get(hotkey)
+            # Every press counts, so holding a combo down keeps it suppressed
+            self._last_press[hotkey] = now
+        if last is not None and now - last < debounce:
+            metrics.inc("trigger.debounced")
+            return None
+
+        hotkey_info = (self.settings.get("hotkeys") or {}).get(hotkey) or {}
+        if hotkey_info.get("supersede", False):
+            stale = self.scheduler.jobs(hotkey)
+            if stale:
+                metrics.inc("trigger.superseded", len(stale))
+                logger.info(f"New press of '{hotkey}' supersedes {len(stale)} in-flight job(s)")
+                for job in stale:
+                    self.scheduler.cancel(job)
+        else:
+            # Only a job that has not captured its selection yet is sure to
+            # see the same text; a running one may be working on another
+            # paragraph, so this press has to capture its own
+            pending = self.scheduler.pending(hotkey)
+            if pending:
+                metrics.inc("trigger.coalesced")
+                return pending[0]
+        return self.scheduler.submit(hotkey, func, *args)
@@ -0,0 +1,46 @@
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from settings_manager import SettingsManager
+
+DEFAULTS_FILE = Path(__file__).resolve().parent.parent / "defaults.json"
+
+
+def make_settings(test, **values):
+    # Real defaults.json with a throwaway config.json; cleaned up with the test
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    settings = SettingsManager(Path(directory.name) / "config.json", DEFAULTS_FILE, save_delay=0)
+    if values:
+        settings.update(values)
+    return settings
+
+
+class FakeBackends:
+    """Stands in for BackendPool: answers every request with
+    ``answer(system_prompt, text)``, streamed in small deltas, and records
+    what was asked and at which priority."""
+
+    def __init__(self, answer, delay=0.0):
+        self.answer = answer
+        self.delay = delay
+        self.requests = []
+        self.priorities = []
+        self._lock = threading.Lock()
+
+    def _deltas(self, messages, hotkey_info):
+        with self._lock:
+            self.requests.append(messages)
+            self.priorities.append((hotkey_info or {}).get("priority"))
+        text = self.answer(messages[0]["content"], messages[1]["content"])
+        for i in range(0, len(text), 4):
+            time.sleep(self.delay)
+            yield text[i:i + 4]
+
+    def stream(self, messages, max_tokens, hotkey_info=None, job=None, cache=None, model=None):
+        return self._deltas(messages, hotkey_info)
+
+    def complete(self, messages, max_tokens, hotkey_info=None, job=None, cache=None, model=None):
+        return "".join(self._deltas(messages, hotkey_info))
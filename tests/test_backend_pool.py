@@ -0,0 +1,135 @@
+import tempfile
+import threading
+import time
+import unittest
+
+import openai
+
+from backend_pool import BackendPool
+from benchmarks.mock_server import MockOpenAIServer
+from http_transport import ClientPool
+from job_scheduler import Job, JobCancelled
+from metrics import metrics
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
+from tests.support import make_settings
+
+MESSAGES = [{"role": "system", "content": "Proofread"}, {"role": "user", "content": "Ths is a tst."}]
+
+
+class BackendPoolTest(unittest.TestCase):
+    def server(self, **options):
+        server = MockOpenAIServer(**{"ttft": 0.01, "tokens_per_sec": 1000, "tokens": 5, **options}).start()
+        self.addCleanup(server.stop)
+        return server
+
+    def pool(self, default_pool, **settings):
+        settings = make_settings(
+            self, model="gpt-mock", api_key="sk-test",
+            rate_limit={"rpm": None, "tpm": None, "max_retries": 0}, **settings)
+        pool = BackendPool(settings, default_pool)
+        self.addCleanup(pool.close)
+        return pool
+
+    def default_pool(self, server, rpm=None):
+        client_pool = ClientPool(base_url=server.base_url, rate_limiter=RateLimiter(rpm=rpm, max_retries=0))
+        self.addCleanup(client_pool.close)
+        return client_pool
+
+    def test_cache_hit_skips_request_and_admission(self):
+        server = self.server()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache = ResponseCache(directory.name)
+        # One request per minute: a second admission would wait for a minute
+        pool = self.pool(self.default_pool(server, rpm=1))
+        hits = metrics.counters().get("request.cache_hits", 0)
+
+        first = pool.complete(MESSAGES, 16, cache=cache)
+        started = time.monotonic()
+        self.assertEqual(pool.complete(MESSAGES, 16, cache=cache), first)
+        self.assertEqual("".join(pool.stream(MESSAGES, 16, cache=cache)), first)
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(server.requests, 1)
+        self.assertEqual(metrics.counters().get("request.cache_hits", 0), hits + 2)
+
+    def test_streamed_answer_over_the_cache_limit_is_not_kept(self):
+        server = self.server(tokens=20)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache = ResponseCache(directory.name, max_entry_chars=20)
+        pool = self.pool(self.default_pool(server))
+
+        answer = "".join(pool.stream(MESSAGES, 64, cache=cache))
+        self.assertGreater(len(answer), 20)  # Still delivered in full
+        self.assertIsNone(cache.get(cache.key_for("gpt-mock", MESSAGES, 64)))
+
+    def test_bad_request_fails_without_failover(self):
+        bad = self.server(error_rate=1.0, error_status=400)
+        good = self.server()
+        pool = self.pool(self.default_pool(good), backends=[
+            {"name": "bad", "base_url": bad.base_url}, {"name": "good", "base_url": good.base_url}])
+
+        with self.assertRaises(openai.BadRequestError):
+            pool.complete(MESSAGES, 16)
+        self.assertEqual(good.requests, 0)
+        # The request was at fault, not the backend
+        self.assertTrue(all(backend.healthy for backend in pool.backends()))
+
+    def test_server_error_fails_over_and_marks_backend_unhealthy(self):
+        bad = self.server(error_rate=1.0, error_status=500)
+        good = self.server()
+        pool = self.pool(self.default_pool(good), backends=[
+            {"name": "bad", "base_url": bad.base_url}, {"name": "good", "base_url": good.base_url}])
+
+        self.assertTrue("".join(pool.stream(MESSAGES, 16)))
+        self.assertEqual((bad.requests, good.requests), (1, 1))
+        health = {backend.name: backend.healthy for backend in pool.backends()}
+        self.assertEqual(health, {"bad": False, "good": True})
+
+    def test_slow_backend_is_hedged(self):
+        slow = self.server(ttft=1.0)
+        fast = self.server()
+        pool = self.pool(self.default_pool(fast), routing={"hedge": True, "hedge_initial_delay_ms": 100}, backends=[
+            {"name": "slow", "base_url": slow.base_url}, {"name": "fast", "base_url": fast.base_url}])
+        wins = metrics.counters().get("request.hedge_wins", 0)
+
+        started = time.monotonic()
+        self.assertTrue("".join(pool.stream(MESSAGES, 16)))
+        self.assertLess(time.monotonic() - started, 0.8)
+        self.assertEqual(metrics.counters().get("request.hedge_wins", 0), wins + 1)
+        # The loser counts as slow, so the next request goes to the fast one first
+        self.assertEqual([backend.name for backend in pool.candidates()], ["fast", "slow"])
+
+    def test_hedged_non_stream_loser_is_aborted_and_not_cached(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache = ResponseCache(directory.name)
+        slow = self.server(ttft=0.5)
+        fast = self.server()
+        pool = self.pool(self.default_pool(fast), routing={"hedge": True, "hedge_initial_delay_ms": 100}, backends=[
+            {"name": "slow", "base_url": slow.base_url, "model": "slow-model"},
+            {"name": "fast", "base_url": fast.base_url, "model": "fast-model"}])
+
+        self.assertTrue(pool.complete(MESSAGES, 16, cache=cache))
+        time.sleep(0.8)  # Long enough for the slow answer to have arrived
+        self.assertIsNotNone(cache.get(cache.key_for("fast-model", MESSAGES, 16)))
+        self.assertIsNone(cache.get(cache.key_for("slow-model", MESSAGES, 16)))
+
+    def test_cancelling_the_job_aborts_a_non_stream_request(self):
+        server = self.server(ttft=2.0)
+        pool = self.pool(self.default_pool(server))
+        job = Job(1, "proofread", None, (), {})
+        threading.Timer(0.2, job.cancel).start()
+
+        started = time.monotonic()
+        with self.assertRaises(JobCancelled):
+            pool.complete(MESSAGES, 16, job=job)
+        # The request itself is aborted, not left running in the background
+        while any(thread.name == "backend-default" for thread in threading.enumerate()):
+            time.sleep(0.01)
+        self.assertLess(time.monotonic() - started, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import time
+import unittest
+
+from chunking import (context_window, iter_chunks, split_for_settings, split_text,
+                      stream_chunks)
+from tests.support import make_settings
+
+TEXT = (
+    "First paragraph. It has two sentences!\n\n"
+    "Second paragraph is a single rather long sentence that goes on and on without a stop\n"
+    "\n   \n"
+    "Third… with an ellipsis. And a question? Yes.\n\n"
+    + "unbreakable" * 20
+)
+
+
+class SplitTextTest(unittest.TestCase):
+    def test_round_trip_and_budget(self):
+        for max_chars in (10, 25, 60, 200, 10000):
+            chunks = split_text(TEXT, max_chars)
+            self.assertEqual("".join(chunk + separator for chunk, separator in chunks), TEXT)
+            for chunk, _ in chunks:
+                self.assertLessEqual(len(chunk), max_chars)
+
+    def test_fits_in_one_chunk(self):
+        self.assertEqual(split_text("short", 100), [("short", "")])
+
+
+class SplitForSettingsTest(unittest.TestCase):
+    def setUp(self):
+        self.settings = make_settings(self, model="gpt-4")  # 8,192 token window
+        self.hotkeys = self.settings.get("hotkeys")
+
+    def test_hotkeys_without_chunk_are_never_split(self):
+        text = "A sentence here. " * 5000
+        for action in ("general", "auto_complete", "fact_check"):
+            self.assertEqual(split_for_settings(text, self.settings, self.hotkeys[action]), [(text, "")])
+
+    def test_chunked_hotkey_splits_by_context_and_output_budget(self):
+        text = "A sentence here. " * 5000
+        chunks = split_for_settings(text, self.settings, self.hotkeys["proofread"], "gpt-4", 1024)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunk + separator for chunk, separator in chunks), text)
+
+    def test_small_selection_is_not_split(self):
+        text = "A sentence here. " * 75  # About 1,300 characters
+        self.assertEqual(len(split_for_settings(text, self.settings, self.hotkeys["proofread"])), 1)
+
+    def test_disabled(self):
+        self.settings.set("chunking", {"enabled": False})
+        text = "A sentence here. " * 5000
+        self.assertEqual(len(split_for_settings(text, self.settings, self.hotkeys["proofread"])), 1)
+
+
+class ContextWindowTest(unittest.TestCase):
+    def test_longest_prefix_wins(self):
+        self.assertEqual(context_window("gpt-4o-mini"), 128000)
+        self.assertEqual(context_window("gpt-4-0613"), 8192)
+        self.assertEqual(context_window("gpt-4-turbo-2024-04-09"), 128000)
+
+    def test_overrides_and_unknown_models(self):
+        self.assertEqual(context_window("gpt-4o", {"gpt-4o": 1000}), 1000)
+        self.assertEqual(context_window("local-model", {"local": 32000}), 32000)
+        self.assertEqual(context_window("something-else"), 8192)
+
+
+class ConcurrentChunksTest(unittest.TestCase):
+    CHUNKS = [("a", " "), ("b", " "), ("c", "")]
+
+    @staticmethod
+    def slow_first(text):
+        # The first chunk finishes last
+        time.sleep(0.1 if text == "a" else 0.0)
+        return text.upper()
+
+    def test_iter_chunks_keeps_order(self):
+        self.assertEqual("".join(iter_chunks(self.CHUNKS, self.slow_first)), "A B C")
+
+    def test_stream_chunks_keeps_order(self):
+        def stream(text):
+            yield self.slow_first(text)
+            yield "!"
+        self.assertEqual("".join(stream_chunks(self.CHUNKS, stream)), "A! B! C!")
+
+    def test_stream_chunks_runs_chunks_concurrently(self):
+        def stream(text):
+            time.sleep(0.2)
+            yield text
+
+        start = time.perf_counter()
+        list(stream_chunks(self.CHUNKS, stream, max_parallel=3))
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import io
+import json
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stderr
+from pathlib import Path
+from unittest import mock
+
+import cli
+from benchmarks.mock_server import MockOpenAIServer
+from rate_limiter import PRIORITY_BATCH
+from tests.support import FakeBackends, make_settings
+
+
+def slow_first(prompt, text):
+    # Earlier documents take longer, so they finish last
+    time.sleep(0.02 * (5 - int(text[-1])))
+    if text.startswith("bad"):
+        raise RuntimeError("Backend refused")
+    return text.upper()
+
+
+class BatchRunTest(unittest.TestCase):
+    def setUp(self):
+        self.settings = make_settings(self, model="gpt-mock")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def run_batch(self, backends, inputs, **options):
+        runner = cli.BatchRunner(self.settings, "fact_check", backends)
+        output = io.StringIO()
+        counts = cli.run(runner, iter(inputs), output, concurrency=4, **options)
+        return counts, [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_output_keeps_input_order(self):
+        backends = FakeBackends(slow_first)
+        inputs = [(f"doc{i}", f"text {i}", None) for i in range(5)]
+        counts, records = self.run_batch(backends, inputs)
+        self.assertEqual([record["id"] for record in records], [f"doc{i}" for i in range(5)])
+        self.assertEqual(records[0]["output"], "TEXT 0")
+        self.assertEqual(counts, {"done": 5, "resumed": 0, "failed": 0})
+        # Behind any interactive work on the same rate limiter
+        self.assertEqual(set(backends.priorities), {PRIORITY_BATCH})
+
+    def test_completion_order(self):
+        inputs = [(f"doc{i}", f"text {i}", None) for i in range(5)]
+        _, records = self.run_batch(FakeBackends(slow_first), inputs, ordered=False)
+        self.assertEqual(records[-1]["id"], "doc0")
+        self.assertEqual(sorted(record["id"] for record in records), [f"doc{i}" for i in range(5)])
+
+    def test_checkpoint_resumes_and_retries_failures(self):
+        checkpoint = self.directory / "checkpoint.jsonl"
+        inputs = [("doc0", "text 0", None), ("doc1", "bad 1", None), ("doc2", None, "Line 3 is not valid JSON"),
+                  ("doc3", "text 3", None)]
+        counts, records = self.run_batch(FakeBackends(slow_first), inputs, checkpoint=checkpoint)
+        self.assertEqual(counts, {"done": 2, "resumed": 0, "failed": 2})
+        self.assertEqual([record.get("error") for record in records],
+                         [None, "Backend refused", "Line 3 is not valid JSON", None])
+        self.assertEqual([json.loads(line)["id"] for line in checkpoint.read_text().splitlines()],
+                         ["doc3", "doc0"])
+
+        backends = FakeBackends(slow_first)
+        inputs[1:3] = [("doc1", "text 1", None), ("doc2", "text 2", None)]
+        counts, records = self.run_batch(backends, inputs, checkpoint=checkpoint)
+        self.assertEqual(counts, {"done": 2, "resumed": 2, "failed": 0})
+        self.assertEqual([record["output"] for record in records], ["TEXT 0", "TEXT 1", "TEXT 2", "TEXT 3"])
+        self.assertEqual(sorted(messages[1]["content"] for messages in backends.requests), ["text 1", "text 2"])
+
+    def test_pipeline_stages_run_at_batch_priority(self):
+        backends = FakeBackends(lambda prompt, text: f"{text} [{prompt.split()[1]}]")
+        runner = cli.BatchRunner(self.settings, "proofread_and_check", backends)
+        self.assertEqual(runner.process("doc", "Text.")["output"], "Text. [proofread] [fact]")
+        self.assertEqual(backends.priorities, [PRIORITY_BATCH, PRIORITY_BATCH])
+
+    def test_unknown_action(self):
+        for action in ("missing", "repaste"):
+            with self.assertRaises(ValueError):
+                cli.BatchRunner(self.settings, action, FakeBackends(slow_first))
+
+
+class ReadInputsTest(unittest.TestCase):
+    def test_bad_stdin_lines_become_errors(self):
+        stdin = io.StringIO('{"id": "a", "text": "one"}\nnot json\n\n[1]\n{"id": "b"}\n{"text": "two"}\n')
+        with mock.patch("sys.stdin", stdin):
+            inputs = list(cli.read_inputs([], "*"))
+        self.assertEqual([(doc_id, text) for doc_id, text, _ in inputs],
+                         [("a", "one"), ("2", None), ("4", None), ("b", None), ("6", "two")])
+        self.assertEqual([error is None for _, _, error in inputs], [True, False, False, False, True])
+
+    def test_unreadable_files_become_errors(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        root = Path(directory.name)
+        (root / "a.txt").write_text("fine", encoding="utf-8")
+        (root / "b.txt").write_bytes(b"\xff\xfe latin-1 \xe9")
+        inputs = list(cli.read_inputs([str(root), str(root / "missing.txt")], "*.txt"))
+        self.assertEqual([(Path(doc_id).name, text) for doc_id, text, _ in inputs],
+                         [("a.txt", "fine"), ("b.txt", None), ("missing.txt", None)])
+        self.assertIn("Could not read", inputs[1][2])
+
+
+class MainTest(unittest.TestCase):
+    def test_stdin_batch_against_mock_server(self):
+        server = MockOpenAIServer(ttft=0.01, tokens_per_sec=1000, tokens=3).start()
+        self.addCleanup(server.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        root = Path(directory.name)
+        config = root / "config.json"
+        config.write_text(json.dumps({"api_key": "sk-test", "model": "gpt-mock", "http": {"base_url": server.base_url}}))
+        output = root / "out.jsonl"
+
+        stdin = io.StringIO('{"id": "a", "text": "one"}\n{"id": "b", "text": \n{"id": "c", "text": "three"}\n')
+        with mock.patch("sys.stdin", stdin), redirect_stderr(io.StringIO()) as stderr:
+            status = cli.main(["fact_check", "--config", str(config), "--no-cache", "-o", str(output)])
+        records = [json.loads(line) for line in output.read_text().splitlines()]
+        self.assertEqual(status, 1)
+        self.assertEqual([record["id"] for record in records], ["a", "2", "c"])
+        self.assertEqual(records[0]["output"], "tok0 tok1 tok2 ")
+        self.assertIn("error", records[1])
+        self.assertIn("2 done, 0 resumed, 1 failed", stderr.getvalue())
+        self.assertEqual(server.requests, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
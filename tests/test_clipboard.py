@@ -0,0 +1,65 @@
+import threading
+import time
+import unittest
+
+from benchmarks.fakes import FakeDesktop
+from clipboard import ClipboardIO
+
+
+class ClipboardIOTest(unittest.TestCase):
+    def setUp(self):
+        self.desktop = FakeDesktop(selection="Selected text", copy_latency=0.02, key_latency=0)
+
+    def clipboard(self, **options):
+        options = {"capture_timeout": 0.3, "release_timeout": 0.3, "paste_settle": 0, **options}
+        return ClipboardIO(**self.desktop.backends(), **options)
+
+    def test_capture_waits_for_the_copy_and_restores_the_clipboard(self):
+        clipboard = self.clipboard()
+        self.assertEqual(clipboard.capture_selection(), "Selected text")
+        self.assertEqual(self.desktop.clipboard, "original clipboard")
+        # Polling, not a fixed sleep: done shortly after the copy lands
+        self.assertLess(clipboard.last_capture_latency, 0.2)
+
+    def test_selection_equal_to_the_clipboard_is_still_seen(self):
+        self.desktop.clipboard = "Selected text"
+        self.assertEqual(self.clipboard().capture_selection(), "Selected text")
+
+    def test_nothing_copied_times_out_empty(self):
+        backends = self.desktop.backends()
+        backends["send_keys"] = lambda *keys: None  # The app ignores ctrl+c
+        clipboard = ClipboardIO(**backends, capture_timeout=0.1, release_timeout=0.1)
+        self.assertEqual(clipboard.capture_selection(), "")
+        self.assertGreaterEqual(clipboard.last_capture_latency, 0.1)
+        self.assertEqual(self.desktop.clipboard, "original clipboard")
+
+    def test_copy_waits_for_modifiers_to_be_released(self):
+        released = threading.Event()
+        threading.Timer(0.1, released.set).start()
+        sent = []
+        backends = self.desktop.backends()
+        send_keys = backends["send_keys"]
+
+        def record(*keys):
+            sent.append(released.is_set())
+            send_keys(*keys)
+        backends.update(send_keys=record, is_pressed=lambda key: key == "shift" and not released.is_set())
+        clipboard = ClipboardIO(**backends, capture_timeout=0.3, release_timeout=1.0)
+        self.assertEqual(clipboard.capture_selection(), "Selected text")
+        self.assertEqual(sent, [True])
+
+    def test_held_modifiers_do_not_block_forever(self):
+        backends = dict(self.desktop.backends(), is_pressed=lambda key: True)
+        clipboard = ClipboardIO(**backends, capture_timeout=0.3, release_timeout=0.05)
+        started = time.perf_counter()
+        self.assertEqual(clipboard.capture_selection(), "Selected text")
+        self.assertLess(time.perf_counter() - started, 0.3)
+
+    def test_paste_text_restores_the_clipboard(self):
+        self.clipboard().paste_text("Answer")
+        self.assertEqual(self.desktop.pasted, ["Answer"])
+        self.assertEqual(self.desktop.clipboard, "original clipboard")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from history_store import HistoryStore
+
+
+class HistoryStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # Not created yet: the store makes its own parent directory
+        self.path = Path(directory.name) / "data" / "history.sqlite3"
+
+    def open(self, **options):
+        store = HistoryStore(self.path, **options)
+        self.addCleanup(store.close)
+        return store
+
+    def test_search_matches_word_prefixes_in_input_and_output(self):
+        store = self.open()
+        store.record("proofread", "gpt-4o", "The quick brown fox", "Fixed the fox")
+        store.record("fact_check", "gpt-4o", "Lazy dogs sleep", "Mostly true")
+        store.flush()
+
+        self.assertEqual([row["hotkey"] for row in store.search("qui")], ["proofread"])
+        self.assertEqual([row["hotkey"] for row in store.search("mostly")], ["fact_check"])
+        self.assertEqual(store.search("fox lazy"), [])  # Every word must match
+        # FTS syntax in the query is taken as plain text
+        self.assertEqual(store.search('fox" OR "dogs'), [])
+        self.assertEqual(len(store.search("  ")), 2)
+
+    def test_listings_preview_the_input_and_get_returns_everything(self):
+        store = self.open()
+        store.record("general", "gpt-4o", "x" * 500, "answer", latency=0.5, tokens=12)
+        store.flush()
+
+        [row] = store.recent()
+        self.assertEqual(len(row["input"]), 200)
+        self.assertNotIn("output", row)
+        entry = store.get(row["id"])
+        self.assertEqual((len(entry["input"]), entry["output"], entry["tokens"]), (500, "answer", 12))
+        self.assertEqual(store.latest(), entry)
+        self.assertEqual(store.count(), 1)
+
+    def test_empty_answers_are_not_recorded(self):
+        store = self.open()
+        store.record("general", "gpt-4o", "text", "")
+        store.flush()
+        self.assertEqual(store.count(), 0)
+
+    def test_retention_keeps_the_newest_entries(self):
+        store = self.open(max_entries=3)
+        store.PRUNE_EVERY = 5
+        for i in range(5):
+            store.record("general", "gpt-4o", f"input {i}", f"output {i}")
+        store.flush()
+
+        self.assertEqual([row["input"] for row in store.recent()], ["input 4", "input 3", "input 2"])
+        self.assertEqual(store.search("input 0"), [])  # Gone from the index too
+
+    def test_old_entries_are_dropped_when_the_store_opens(self):
+        store = self.open()
+        store.record("general", "gpt-4o", "old", "answer")
+        store.flush()
+        time.sleep(0.3)
+        store.record("general", "gpt-4o", "new", "answer")
+        store.flush()
+        store.close()
+
+        store = self.open(max_age=0.2)
+        store.flush()  # Queued behind the opening retention pass
+        self.assertEqual([row["input"] for row in store.recent()], ["new"])
+
+    def test_clear(self):
+        store = self.open()
+        store.record("general", "gpt-4o", "text", "answer")
+        store.clear()
+        store.flush()
+        self.assertEqual(store.count(), 0)
+        self.assertEqual(store.search("text"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+from hotkey_registry import HotkeyConflictError, HotkeyRegistry, normalize_combo
+
+
+class FakeKeyboard:
+    def __init__(self):
+        self.calls = []
+        self.hooks = {}
+        self._handles = 0
+
+    def add_hotkey(self, key_combo, callback, args=()):
+        self._handles += 1
+        self.calls.append(("add", key_combo))
+        self.hooks[self._handles] = (key_combo, callback, args)
+        return self._handles
+
+    def remove_hotkey(self, handle):
+        self.calls.append(("remove", self.hooks.pop(handle)[0]))
+
+    def press(self, key_combo):
+        for combo, callback, args in list(self.hooks.values()):
+            if combo == key_combo:
+                callback(*args)
+
+
+class HotkeyRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.keyboard = FakeKeyboard()
+        self.fired = []
+        self.registry = HotkeyRegistry(self.fired.append, self.keyboard.add_hotkey, self.keyboard.remove_hotkey)
+        self.registry.apply({
+            "proofread": {"key_combo": "ctrl+shift+r", "prompt": "Proofread"},
+            "general": {"key_combo": "ctrl+shift+g", "prompt": ""},
+        })
+        self.keyboard.calls.clear()
+
+    def test_only_changed_combos_are_touched(self):
+        self.registry.apply({
+            "proofread": {"key_combo": "Shift+Ctrl+R", "prompt": "Proofread again"},
+            "general": {"key_combo": "ctrl+shift+j", "prompt": ""},
+        })
+        # Added before removed, so the action is never without a hotkey
+        self.assertEqual(self.keyboard.calls, [("add", "ctrl+shift+j"), ("remove", "ctrl+shift+g")])
+        self.keyboard.press("ctrl+shift+j")
+        self.assertEqual(self.fired, ["general"])
+
+    def test_rebinding_a_combo_keeps_its_hook(self):
+        self.registry.apply({"renamed": {"key_combo": "ctrl+shift+r", "prompt": "Proofread"}})
+        self.assertEqual(self.keyboard.calls, [("remove", "ctrl+shift+g")])
+        self.keyboard.press("ctrl+shift+r")
+        self.assertEqual(self.fired, ["renamed"])
+
+    def test_conflict_keeps_current_bindings(self):
+        with self.assertRaises(HotkeyConflictError):
+            self.registry.apply({
+                "proofread": {"key_combo": "ctrl+shift+r", "prompt": "Proofread"},
+                "general": {"key_combo": "shift+ctrl+r", "prompt": ""},
+            })
+        self.assertEqual(self.keyboard.calls, [])
+        self.assertEqual(self.registry.actions(), {"ctrl+r+shift": "proofread", "ctrl+g+shift": "general"})
+
+    def test_clear(self):
+        self.registry.clear()
+        self.assertEqual(self.keyboard.hooks, {})
+        self.assertEqual(self.registry.actions(), {})
+
+
+class NormalizeComboTest(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize_combo("Shift+Ctrl+R"), normalize_combo("ctrl+shift+r"))
+        self.assertEqual(normalize_combo("ctrl+a, B+Alt"), "a+ctrl, alt+b")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import threading
+import unittest
+
+from job_scheduler import JobCancelled, JobScheduler
+
+
+class JobSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = JobScheduler(max_workers=2, max_queue=4)
+        self.addCleanup(self.scheduler.shutdown)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def block(self, job):
+        self.release.wait(2)
+        return job.hotkey
+
+    def test_per_hotkey_limit_leaves_other_hotkeys_free(self):
+        first = self.scheduler.submit("proofread", self.block)
+        queued = self.scheduler.submit("proofread", self.block)
+        other = self.scheduler.submit("general", lambda job: "done")
+        # The second proofread job waits for the first; general does not
+        self.assertTrue(other.done.wait(2))
+        self.assertEqual(other.result, "done")
+        self.assertIsNone(queued.started_at)
+        self.release.set()
+        self.assertTrue(first.done.wait(2) and queued.done.wait(2))
+
+    def test_full_queue_drops_triggers(self):
+        self.scheduler.submit("proofread", self.block)
+        submitted = [self.scheduler.submit("proofread", self.block) for _ in range(6)]
+        self.assertIn(None, submitted)
+        self.assertLessEqual(self.scheduler.queue_depth(), 4)
+
+    def test_cancel_pending_and_running_jobs(self):
+        started = threading.Event()
+
+        def wait_for_cancel(job):
+            started.set()
+            job.sleep(5)
+
+        running = self.scheduler.submit("proofread", wait_for_cancel)
+        self.assertTrue(started.wait(2))
+        pending = self.scheduler.submit("proofread", wait_for_cancel)
+        self.scheduler.cancel_hotkey("proofread")
+        self.assertTrue(running.done.wait(2))
+        self.assertTrue(pending.cancelled)
+        self.assertIsNone(pending.started_at)
+        self.assertIsNone(running.exception)
+        with self.assertRaises(JobCancelled):
+            running.check_cancelled()
+
+    def test_errors_are_kept_on_the_job(self):
+        def fail(job):
+            raise RuntimeError("boom")
+
+        job = self.scheduler.submit("proofread", fail)
+        self.assertTrue(job.done.wait(2))
+        self.assertIsInstance(job.exception, RuntimeError)
+
+
+if __name__ == "__main__":
+    unittest.main()
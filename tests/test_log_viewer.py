@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+from gui.log_viewer import LogViewer  # noqa: E402
+
+
+def record(level, message):
+    return f"2024-01-01 12:00:00,000 tibikey {level}: {message}\n"
+
+
+class LogViewerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log_file = Path(directory.name) / "app.log"
+
+    def viewer(self, max_lines=2000):
+        viewer = LogViewer(str(self.log_file), max_lines=max_lines)
+        self.addCleanup(viewer.deleteLater)
+        return viewer
+
+    def write(self, text, mode="a"):
+        with open(self.log_file, mode, encoding="utf-8") as f:
+            f.write(text)
+
+    def texts(self, viewer):
+        return [text for _, text in viewer.lines]
+
+    def test_reads_only_appended_complete_lines(self):
+        self.write(record("INFO", "one") + record("INFO", "two"))
+        viewer = self.viewer()
+        self.assertEqual(len(viewer.lines), 2)
+        self.write(record("INFO", "three") + "2024-01-01 12:00:01,000 tibikey INFO: fo")
+        viewer.readAppended()
+        self.assertEqual(len(viewer.lines), 3)
+        self.write("ur\n")
+        viewer.readAppended()
+        self.assertEqual(self.texts(viewer)[-1], "2024-01-01 12:00:01,000 tibikey INFO: four")
+
+    def test_starts_over_after_rotation(self):
+        self.write(record("INFO", "old"))
+        viewer = self.viewer()
+        self.log_file.rename(self.log_file.with_suffix(".log.1"))
+        self.write(record("INFO", "new"), mode="w")
+        viewer.readAppended()
+        self.assertEqual(self.texts(viewer), [record("INFO", "old").strip(), record("INFO", "new").strip()])
+
+    def test_starts_over_after_truncation(self):
+        self.write(record("INFO", "a long line before truncation"))
+        viewer = self.viewer()
+        self.write(record("INFO", "short"), mode="w")
+        viewer.readAppended()
+        self.assertEqual(self.texts(viewer)[-1], record("INFO", "short").strip())
+
+    def test_large_file_loads_only_the_tail(self):
+        self.write("".join(record("INFO", f"line {i}") for i in range(5000)))
+        viewer = self.viewer(max_lines=10)
+        self.assertEqual(len(viewer.lines), 10)
+        self.assertEqual(self.texts(viewer)[-1], record("INFO", "line 4999").strip())
+        # The first line read from the middle of the file is skipped, not shown cut off
+        self.assertTrue(all(text.startswith("2024-") for text in self.texts(viewer)))
+
+    def test_level_filter_keeps_tracebacks_with_their_record(self):
+        self.write(record("INFO", "fine") + record("ERROR", "failed") + "Traceback (most recent call last):\n")
+        viewer = self.viewer()
+        viewer.levelComboBox.setCurrentText("WARNING")
+        self.assertEqual(viewer.textBox.toPlainText().splitlines(),
+                         [record("ERROR", "failed").strip(), "Traceback (most recent call last):"])
+        viewer.filterEdit.setText("TRACEBACK")
+        self.assertEqual(viewer.textBox.toPlainText(), "Traceback (most recent call last):")
+
+
+if __name__ == "__main__":
+    unittest.main()
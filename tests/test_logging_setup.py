@@ -0,0 +1,57 @@
+import json
+import logging
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from logging_setup import request_id, setup_logging
+from tests.support import make_settings
+
+
+class LoggingSetupTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        root = logging.getLogger()
+        handlers, level = list(root.handlers), root.level
+
+        def restore():
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            for handler in handlers:
+                root.addHandler(handler)
+            root.setLevel(level)
+        self.addCleanup(restore)
+
+    def test_records_carry_the_request_id_of_the_logging_thread(self):
+        settings = make_settings(self, logging={
+            "level": "INFO", "levels": {}, "json_file": str(self.directory / "app.jsonl")})
+        listener = setup_logging(self.directory / "app.log", settings)
+        logger = logging.getLogger("tests.logging")
+
+        def job():
+            token = request_id.set(42)
+            try:
+                logger.info("Handled", extra={"total_ms": 12.5})
+            finally:
+                request_id.reset(token)
+
+        thread = threading.Thread(target=job)
+        thread.start()
+        thread.join()
+        logger.debug("Below the level")
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+        records = [json.loads(line) for line in (self.directory / "app.jsonl").read_text().splitlines()]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["request_id"], 42)
+        self.assertEqual(records[0]["total_ms"], 12.5)
+        self.assertIn("tests.logging INFO: Handled", (self.directory / "app.log").read_text())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from model_policy import ModelPolicy
+from model_registry import ModelRegistry
+from tests.support import make_settings
+
+POLICY = {
+    "tiers": [{"max_chars": 10, "model": "small-model"}, {"max_tokens": 500}],
+}
+
+
+class ModelPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.settings = make_settings(self, model="global-model", max_tokens=200)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_file = Path(directory.name) / "models.json"
+
+    def registry(self, models):
+        self.cache_file.write_text(json.dumps({"fetched_at": time.time(), "models": models}))
+        return ModelRegistry(self.cache_file)
+
+    def test_hotkeys_without_policy_use_the_global_settings(self):
+        policy = ModelPolicy(self.settings, self.registry(["small-model"]))
+        self.assertEqual(policy.select({}, "text"), ("global-model", 200))
+
+    def test_tier_model_is_used_when_the_registry_has_it(self):
+        policy = ModelPolicy(self.settings, self.registry(["small-model", "global-model"]))
+        self.assertEqual(policy.select({"policy": POLICY}, "short"), ("small-model", 200))
+        self.assertEqual(policy.select({"policy": POLICY}, "x" * 50), ("global-model", 500))
+
+    def test_unknown_or_missing_models_fall_back_to_the_global_model(self):
+        for registry in (None, ModelRegistry(self.cache_file), self.registry(["global-model"])):
+            policy = ModelPolicy(self.settings, registry)
+            self.assertEqual(policy.select({"policy": POLICY}, "short")[0], "global-model")
+
+    def test_output_ratio_scales_with_the_selection(self):
+        self.settings.set("allowed_tokens_range", [1, 1000])
+        policy = ModelPolicy(self.settings)
+        hotkey_info = {"policy": {"output_ratio": 1.0, "min_tokens": 10}}
+        short = policy.select(hotkey_info, "word " * 10)[1]
+        long = policy.select(hotkey_info, "word " * 200)[1]
+        self.assertGreater(short, 10)
+        self.assertGreater(long, short)
+        self.assertEqual(policy.select(hotkey_info, "word " * 10000)[1], 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from prompt_chain import chain_stream, paragraphs, pipeline_stages
+from tests.support import make_settings
+
+
+def deltas(text, size=3):
+    # Splits text at arbitrary points, the way a stream does
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class ParagraphsTest(unittest.TestCase):
+    def test_breaks_split_across_deltas(self):
+        text = "One.\n\nTwo, two.\n \nThree."
+        for size in (1, 2, 3, 7, 100):
+            self.assertEqual(
+                list(paragraphs(deltas(text, size), "!")),
+                [("One.", "\n\n"), ("Two, two.", "\n \n"), ("Three.", "!")])
+
+    def test_trailing_break_gives_way_to_separator(self):
+        self.assertEqual(list(paragraphs(["Only.\n\n"], " ")), [("Only.", " ")])
+        self.assertEqual(list(paragraphs([], "")), [])
+
+
+class ChainStreamTest(unittest.TestCase):
+    def test_stages_run_in_order_and_keep_separators(self):
+        def upper(text):
+            return iter(deltas(text.upper() + "\n\n"))
+
+        def tag(text):
+            return iter(deltas(f"<{text}>"))
+
+        chunks = [("a.\n\nb.", "\n\n"), ("c.", "")]
+        self.assertEqual("".join(chain_stream(chunks, [upper, tag])), "<A.>\n\n<B.>\n\n<C.>")
+
+    def test_single_stage(self):
+        self.assertEqual("".join(chain_stream([("x", " "), ("y", "")], [lambda text: iter([text * 2])])), "xx yy")
+
+    def test_error_in_an_earlier_stage_reaches_the_caller(self):
+        def failing(text):
+            raise RuntimeError("stage failed")
+
+        with self.assertRaises(RuntimeError):
+            list(chain_stream([("a", "")], [failing, lambda text: iter([text])]))
+
+
+class PipelineStagesTest(unittest.TestCase):
+    def setUp(self):
+        self.hotkeys = make_settings(self).get("hotkeys")
+
+    def test_resolves_stage_settings(self):
+        stages = pipeline_stages(self.hotkeys, "proofread_and_check")
+        self.assertEqual(stages, [self.hotkeys["proofread"], self.hotkeys["fact_check"]])
+
+    def test_invalid_pipelines(self):
+        hotkeys = dict(self.hotkeys, broken={"pipeline": ["proofread", "missing"]},
+                       nested={"pipeline": ["proofread_and_check"]}, empty={"pipeline": []})
+        for action in ("broken", "nested", "empty", "general"):
+            with self.assertRaises(ValueError):
+                pipeline_stages(hotkeys, action)
+
+
+if __name__ == "__main__":
+    unittest.main()
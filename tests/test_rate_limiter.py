@@ -0,0 +1,88 @@
+import threading
+import time
+import unittest
+
+import httpx
+import openai
+
+from rate_limiter import (PRIORITY_BATCH, PRIORITY_INTERACTIVE, RateLimiter, TokenBucket,
+                          is_transient, parse_duration)
+
+
+def api_error(status, headers=None):
+    response = httpx.Response(status, headers=headers, request=httpx.Request("POST", "http://test"))
+    return openai.APIStatusError("error", response=response, body=None)
+
+
+class ParseDurationTest(unittest.TestCase):
+    def test_formats(self):
+        self.assertEqual(parse_duration("2"), 2.0)
+        self.assertEqual(parse_duration("1s"), 1.0)
+        self.assertEqual(parse_duration("6m0s"), 360.0)
+        self.assertAlmostEqual(parse_duration("20ms"), 0.02)
+        self.assertIsNone(parse_duration(None))
+        self.assertIsNone(parse_duration("soon"))
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_unlimited(self):
+        self.assertEqual(TokenBucket().wait_time(10 ** 6), 0.0)
+
+    def test_wait_time(self):
+        bucket = TokenBucket(60)
+        self.assertEqual(bucket.wait_time(60), 0.0)
+        bucket.take(60)
+        self.assertAlmostEqual(bucket.wait_time(1), 1.0)
+        # More than the whole bucket waits for a full one, not forever
+        self.assertAlmostEqual(bucket.wait_time(1000), 60.0)
+
+    def test_sync_with_headers(self):
+        limiter = RateLimiter(rpm=100)
+        limiter.update({"x-ratelimit-limit-requests": "50", "x-ratelimit-remaining-requests": "3"})
+        self.assertEqual(limiter.requests.capacity, 50)
+        self.assertLess(limiter.requests.level, 4)
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_interactive_overtakes_queued_batch(self):
+        limiter = RateLimiter(rpm=600)  # One request every 0.1 s
+        limiter.requests.level = 0
+        order = []
+
+        def acquire(name, priority):
+            limiter.acquire(1, priority)
+            order.append(name)
+
+        batch = threading.Thread(target=acquire, args=("batch", PRIORITY_BATCH))
+        batch.start()
+        time.sleep(0.02)
+        interactive = threading.Thread(target=acquire, args=("interactive", PRIORITY_INTERACTIVE))
+        interactive.start()
+        batch.join(2)
+        interactive.join(2)
+        self.assertEqual(order, ["interactive", "batch"])
+
+    def test_retry_delay(self):
+        limiter = RateLimiter(max_retries=2, backoff_base=0.01, backoff_max=5)
+        self.assertIsNone(limiter.retry_delay(api_error(400), 0))
+        self.assertIsNone(limiter.retry_delay(api_error(500), 2))
+        self.assertLessEqual(limiter.retry_delay(api_error(503), 0), 0.01)
+
+    def test_429_honours_retry_after_and_pauses_everyone(self):
+        limiter = RateLimiter(max_retries=2, backoff_base=0.01, backoff_max=5)
+        self.assertEqual(limiter.retry_delay(api_error(429, {"retry-after": "0.3"}), 0), 0.3)
+        started = time.monotonic()
+        limiter.acquire(1)
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+    def test_is_transient(self):
+        self.assertTrue(is_transient(api_error(429)))
+        self.assertTrue(is_transient(api_error(502)))
+        self.assertFalse(is_transient(api_error(400)))
+        self.assertFalse(is_transient(api_error(401)))
+        self.assertTrue(is_transient(openai.APIConnectionError(request=httpx.Request("POST", "http://test"))))
+        self.assertFalse(is_transient(ValueError("bad")))
+
+
+if __name__ == "__main__":
+    unittest.main()
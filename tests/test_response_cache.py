@@ -0,0 +1,74 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from response_cache import ResponseCache
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name) / "cache"
+
+    def test_key_covers_model_prompt_text_and_max_tokens(self):
+        key = ResponseCache.make_key("gpt-4o", "Proofread", "Text", 100)
+        self.assertEqual(key, ResponseCache.make_key("gpt-4o", "Proofread", "Text", 100))
+        for other in (("gpt-4", "Proofread", "Text", 100), ("gpt-4o", "Check", "Text", 100),
+                      ("gpt-4o", "Proofread", "Other", 100), ("gpt-4o", "Proofread", "Text", 50)):
+            self.assertNotEqual(key, ResponseCache.make_key(*other))
+
+    def test_entries_survive_a_restart(self):
+        ResponseCache(self.directory).put("key", "answer")
+        cache = ResponseCache(self.directory)
+        self.assertEqual(cache.get("key"), "answer")
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 0, "entries": 1})
+
+    def test_expired_entries_are_dropped(self):
+        cache = ResponseCache(self.directory, ttl=0.05)
+        cache.put("key", "answer")
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(list(self.directory.glob("*.json")), [])
+
+    def test_memory_tier_is_an_lru_bounded_by_bytes(self):
+        cache = ResponseCache(self.directory, max_memory_bytes=2500)
+        for key in ("a", "b", "c"):
+            cache.put(key, key * 1000)
+        self.assertEqual(cache.stats()["entries"], 2)
+        # Evicted from memory, still on disk
+        self.assertEqual(cache.get("a"), "a" * 1000)
+        # One answer larger than the whole tier is only kept on disk
+        cache.put("big", "x" * 5000)
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertEqual(cache.get("big"), "x" * 5000)
+
+    def test_answers_over_the_length_limit_are_not_cached(self):
+        cache = ResponseCache(self.directory, max_entry_chars=10)
+        cache.put("short", "x" * 10)
+        cache.put("long", "x" * 11)
+        self.assertEqual(cache.get("short"), "x" * 10)
+        self.assertIsNone(cache.get("long"))
+        self.assertFalse(self.directory.joinpath("long.json").exists())
+
+    def test_disk_is_trimmed_to_its_budget_oldest_first(self):
+        cache = ResponseCache(self.directory, max_disk_bytes=4000)
+        for i in range(ResponseCache.EVICT_EVERY):
+            cache.put(f"key{i}", "x" * 500)
+            time.sleep(0.002)  # Distinct modification times
+        files = list(self.directory.glob("*.json"))
+        self.assertLessEqual(sum(path.stat().st_size for path in files), 4000)
+        self.assertIn(self.directory / f"key{ResponseCache.EVICT_EVERY - 1}.json", files)
+        self.assertNotIn(self.directory / "key0.json", files)
+
+    def test_clear(self):
+        cache = ResponseCache(self.directory)
+        cache.put("key", "answer")
+        cache.clear()
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(list(self.directory.glob("*.json")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import json
+import unittest
+
+from tests.support import make_settings
+
+
+class SettingsManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.settings = make_settings(self)
+        self.saves = 0
+        save = self.settings.save
+
+        def counted_save():
+            self.saves += 1
+            save()
+        self.settings.save = counted_save
+
+    def test_batch_notifies_and_saves_once(self):
+        notified = []
+        self.settings.add_listener(notified.append)
+        self.settings.update({"api_key": "sk-test", "model": "gpt-4o-mini", "max_tokens": 100})
+        self.assertEqual(len(notified), 1)
+        self.assertEqual(self.saves, 1)
+        saved = json.loads(self.settings.config_file.read_text())
+        self.assertEqual(saved["api_key"], "sk-test")
+
+    def test_values_equal_to_defaults_are_not_saved(self):
+        default = self.settings.defaults["max_tokens"]
+        self.settings.set("max_tokens", default + 1)
+        self.settings.set("max_tokens", default)
+        self.assertNotIn("max_tokens", json.loads(self.settings.config_file.read_text()))
+        self.assertEqual(self.settings.get("max_tokens"), default)
+
+    def test_save_leaves_no_temp_files(self):
+        self.settings.set("api_key", "sk-test")
+        self.settings.set("api_key", "sk-other")
+        files = [path.name for path in self.settings.config_file.parent.iterdir()]
+        self.assertEqual(files, ["config.json"])
+
+    def test_reload_from_disk(self):
+        self.settings.config_file.write_text(json.dumps({"api_key": "sk-disk"}))
+        self.settings.load()
+        self.assertEqual(self.settings.get("api_key"), "sk-disk")
+        self.assertIn("hotkeys", self.settings.settings)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import threading
+import time
+import unittest
+
+from job_scheduler import JobScheduler
+from metrics import metrics
+from single_flight import SingleFlight, TriggerGate
+from tests.support import make_settings
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+        results = []
+        release = threading.Event()
+
+        def work():
+            calls.append(1)
+            release.wait(2)
+            return "answer"
+
+        threads = [threading.Thread(target=lambda: results.append(flight.do("key", work))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [("answer", False)] + [("answer", True)] * 3)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_exception_reaches_every_caller(self):
+        flight = SingleFlight()
+        errors = []
+        release = threading.Event()
+
+        def work():
+            release.wait(2)
+            raise RuntimeError("boom")
+
+        def call():
+            try:
+                flight.do("key", work)
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(len(errors), 3)
+
+
+class TriggerGateTest(unittest.TestCase):
+    def setUp(self):
+        self.settings = make_settings(self, single_flight={"debounce_ms": 50})
+        self.scheduler = JobScheduler(max_workers=2)
+        self.addCleanup(self.scheduler.shutdown)
+        self.gate = TriggerGate(self.scheduler, self.settings)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.calls = []
+
+    def work(self, job, *args):
+        self.calls.append(job)
+        self.release.wait(2)
+
+    def test_repeat_within_debounce_is_dropped(self):
+        first = self.gate.submit("general", self.work)
+        self.assertIsNotNone(first)
+        self.assertIsNone(self.gate.submit("general", self.work))
+
+    def test_press_attaches_to_queued_job(self):
+        coalesced = metrics.counters().get("trigger.coalesced", 0)
+        running = self.gate.submit("fact_check", self.work)
+        time.sleep(0.1)  # Past the debounce window
+        queued = self.gate.submit("fact_check", self.work)
+        self.assertIsNot(queued, running)
+        time.sleep(0.1)
+        # The queued job has not captured anything yet, so it answers this press too
+        self.assertIs(self.gate.submit("fact_check", self.work), queued)
+        self.assertEqual(metrics.counters().get("trigger.coalesced", 0), coalesced + 1)
+        self.release.set()
+        self.assertTrue(queued.done.wait(2))
+        self.assertEqual(self.calls, [running, queued])
+
+    def test_supersede_cancels_running_job(self):
+        # "general" has "supersede" set in defaults.json
+        first = self.gate.submit("general", self.work)
+        time.sleep(0.1)
+        second = self.gate.submit("general", self.work)
+        self.assertIsNot(second, first)
+        self.assertTrue(first.cancelled)
+
+
+if __name__ == "__main__":
+    unittest.main()
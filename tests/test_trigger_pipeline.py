@@ -0,0 +1,142 @@
+import time
+import unittest
+
+from backend_pool import BackendPool
+from benchmarks.fakes import FakeDesktop
+from benchmarks.mock_server import MockOpenAIServer
+from clipboard import ClipboardIO
+from http_transport import ClientPool
+from job_scheduler import JobScheduler
+from single_flight import TriggerGate
+from trigger_pipeline import TriggerPipeline
+from tests.support import FakeBackends, make_settings
+
+
+class TriggerPipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.settings = make_settings(
+            self, model="gpt-mock", api_key="sk-test",
+            clipboard={"capture_timeout_ms": 1000, "release_timeout_ms": 1000, "paste_settle_ms": 0},
+            paste={"flush_interval_ms": 5, "flush_chars": 8, "max_flush_interval_ms": 20},
+            single_flight={"debounce_ms": 50})
+        self.desktop = FakeDesktop(copy_latency=0.001, key_latency=0)
+        self.scheduler = JobScheduler(
+            max_workers=2, default_limit=self.settings.get("scheduler")["per_hotkey_limit"])
+        self.addCleanup(self.scheduler.shutdown)
+        self.notified = []
+
+    def pipeline(self, backends):
+        clipboard = ClipboardIO.from_settings(self.settings, lock=self.scheduler.clipboard_lock,
+                                              **self.desktop.backends())
+        return TriggerPipeline(self.settings, backends, clipboard,
+                               notify=lambda *args: self.notified.append(args))
+
+    def press(self, pipeline, hotkey):
+        job = self.scheduler.submit(hotkey, pipeline.on_triggered)
+        self.assertTrue(job.done.wait(10))
+        return job
+
+    def test_ordinary_selection_is_one_request(self):
+        backends = FakeBackends(lambda prompt, text: text.upper())
+        self.desktop.selection = "Word " * 253  # 1,265 characters
+        for stream in (True, False):
+            with self.subTest(stream=stream):
+                self.settings.set("stream", stream)
+                backends.requests.clear()
+                self.desktop.reset()
+                self.press(self.pipeline(backends), "general")
+                self.assertEqual(len(backends.requests), 1)
+                self.assertEqual(self.desktop.pasted_text(), self.desktop.selection.upper())
+
+    def test_large_selection_is_pasted_in_order_chunk_by_chunk(self):
+        self.settings.set("model", "gpt-4")  # 8,192 token window
+        backends = FakeBackends(lambda prompt, text: text.upper())
+        self.desktop.selection = "".join(f"Sentence number {i}. " for i in range(3000))
+        self.press(self.pipeline(backends), "proofread")
+        self.assertGreater(len(backends.requests), 1)
+        self.assertEqual(self.desktop.pasted_text(), self.desktop.selection.upper())
+
+    def press_twice(self, backends, second_selection):
+        gate = TriggerGate(self.scheduler, self.settings)
+        pipeline = self.pipeline(backends)
+        self.desktop.selection = "First paragraph."
+        first = gate.submit("fact_check", pipeline.on_triggered)
+        time.sleep(0.1)  # Past the debounce window, with the first job still answering
+        self.desktop.selection = second_selection
+        second = gate.submit("fact_check", pipeline.on_triggered)
+        self.assertIsNot(second, first)
+        for job in (first, second):
+            self.assertTrue(job.done.wait(10))
+
+    def test_press_on_another_selection_gets_its_own_answer(self):
+        backends = FakeBackends(lambda prompt, text: text.upper(), delay=0.1)
+        self.press_twice(backends, "Second paragraph.")
+        self.assertEqual([messages[1]["content"] for messages in backends.requests],
+                         ["First paragraph.", "Second paragraph."])
+        self.assertEqual(self.desktop.pasted_text(), "FIRST PARAGRAPH.SECOND PARAGRAPH.")
+
+    def test_press_on_the_same_selection_shares_the_running_request(self):
+        backends = FakeBackends(lambda prompt, text: text.upper(), delay=0.1)
+        self.press_twice(backends, "First paragraph.")
+        self.assertEqual(len(backends.requests), 1)
+        self.assertEqual(self.desktop.pasted_text(), "FIRST PARAGRAPH.")
+
+    def test_oversized_selection_is_rejected(self):
+        self.settings.set("limits", {"max_selection_chars": 100, "max_response_chars": 1000})
+        backends = FakeBackends(lambda prompt, text: text)
+        self.desktop.selection = "x" * 101
+        self.press(self.pipeline(backends), "fact_check")
+        self.assertEqual(backends.requests, [])
+        self.assertEqual(self.desktop.pasted, [])
+        self.assertEqual([title for title, _ in self.notified], ["Selection too large"])
+
+    def test_concurrent_answers_do_not_interleave(self):
+        self.settings.set("stream", True)
+        backends = FakeBackends(lambda prompt, text: prompt.split()[1] * 20, delay=0.005)
+        pipeline = self.pipeline(backends)
+        self.desktop.selection = "Some text."
+        jobs = [self.scheduler.submit(hotkey, pipeline.on_triggered) for hotkey in ("fact_check", "auto_complete")]
+        for job in jobs:
+            self.assertTrue(job.done.wait(10))
+        self.assertEqual(len(backends.requests), 2)
+        # Each job's pastes are contiguous and the user's clipboard is back
+        self.assertIn(self.desktop.pasted_text(), ("fact" * 20 + "auto" * 20, "auto" * 20 + "fact" * 20))
+        self.assertEqual(self.desktop.clipboard, "original clipboard")
+
+    def test_pipeline_feeds_each_stage_the_previous_answer(self):
+        def answer(prompt, text):
+            return f"{text} [{prompt.split()[1]}]\n\n"
+        backends = FakeBackends(answer)
+        self.desktop.selection = "First.\n\nSecond."
+        self.press(self.pipeline(backends), "proofread_and_check")
+        # The second stage gets the first one's answer paragraph by paragraph
+        self.assertEqual(
+            self.desktop.pasted_text(), "First. [fact]\n\nSecond. [proofread] [fact]")
+        self.assertEqual([messages[1]["content"] for messages in backends.requests],
+                         ["First.\n\nSecond.", "First.", "Second. [proofread]"])
+
+
+class MockServerPipelineTest(unittest.TestCase):
+    def test_streamed_answer_is_pasted_and_clipboard_restored(self):
+        server = MockOpenAIServer(ttft=0.01, tokens_per_sec=1000, tokens=30).start()
+        self.addCleanup(server.stop)
+        settings = make_settings(
+            self, model="gpt-mock", api_key="sk-test", stream=True,
+            clipboard={"capture_timeout_ms": 1000, "release_timeout_ms": 1000, "paste_settle_ms": 0})
+        client_pool = ClientPool(base_url=server.base_url)
+        self.addCleanup(client_pool.close)
+        scheduler = JobScheduler(max_workers=1)
+        self.addCleanup(scheduler.shutdown)
+        desktop = FakeDesktop(selection="Ths sentense has a typo.", copy_latency=0.001, key_latency=0)
+        clipboard = ClipboardIO.from_settings(settings, lock=scheduler.clipboard_lock, **desktop.backends())
+        pipeline = TriggerPipeline(settings, BackendPool(settings, client_pool), clipboard)
+
+        job = scheduler.submit("fact_check", pipeline.on_triggered)
+        self.assertTrue(job.done.wait(10))
+        self.assertEqual(desktop.pasted_text().split(), [f"tok{i}" if i % 12 != 11 else f"tok{i}." for i in range(30)])
+        self.assertEqual(desktop.clipboard, "original clipboard")
+        self.assertEqual(server.requests, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
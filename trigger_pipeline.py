@@ -0,0 +1,208 @@
+import logging
+import time
+from functools import partial
+
+from chunking import estimate_tokens, iter_chunks, split_for_settings, stream_chunks
+from job_scheduler import JobCancelled
+from logging_setup import request_id
+from metrics import metrics
+from model_policy import ModelPolicy
+from paste_sink import PasteSink
+from prompt_chain import chain_stream, pipeline_stages
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class TriggerPipeline:
+    """What a hotkey press does once a scheduler worker picks it up: capture
+    the selection, ask the model and paste the answer.
+
+    Kept free of Qt and keyboard hooks so it can be driven headless with fake
+    clipboard backends.
+    """
+
+    def __init__(self, settings, backends, clipboard, cache=None, history=None, policy=None,
+                 notify=None):
+        self.settings = settings
+        self.backends = backends
+        self.clipboard = clipboard
+        self.cache = cache
+        self.history = history
+        self.policy = policy or ModelPolicy(settings)
+        # Called as notify(title, message) for problems the user should see
+        self.notify = notify
+        self.flights = SingleFlight()
+
+    # Function to handle the key combination event, run by a scheduler worker
+    def on_triggered(self, job, prompt=None):
+        # Tags every log record made on behalf of this job
+        token = request_id.set(job.id)
+        try:
+            self._run(job, prompt)
+        finally:
+            request_id.reset(token)
+
+    def _run(self, job, prompt):
+        metrics.inc("trigger.count")
+        queued = job.started_at - job.submitted_at
+        metrics.observe("trigger.queue", queued)
+        settings = self.settings
+        hotkey_info = (settings.get("hotkeys") or {}).get(job.hotkey) or {}
+        if hotkey_info.get("type") == "repaste":
+            self._repaste()
+            return
+        if prompt is None:
+            # Looked up per press so prompt edits apply without re-registering
+            prompt = hotkey_info.get("prompt", "")
+        start = time.perf_counter()
+        try:
+            with metrics.timer("trigger.total"):
+                highlighted_text = self.clipboard.capture_selection()
+                capture = self.clipboard.last_capture_latency
+                metrics.observe("trigger.capture", capture)
+                if not highlighted_text.strip():
+                    logger.warning("No text highlighted.")
+                    return
+                max_chars = (settings.get("limits") or {}).get("max_selection_chars")
+                if max_chars and len(highlighted_text) > max_chars:
+                    metrics.inc("trigger.rejected")
+                    self._reject(
+                        "Selection too large",
+                        f"The selection has {len(highlighted_text):,} characters, "
+                        f"more than the limit of {max_chars:,}. Select less text and try again.")
+                    return
+
+                model, max_tokens = self.policy.select(hotkey_info, highlighted_text)
+
+                # An identical request that is already running answers this
+                # press too; it does the pasting, so this one just waits
+                key = (job.hotkey, highlighted_text, model)
+                _, shared = self.flights.do(
+                    key, partial(self._respond, job, prompt, highlighted_text, model, max_tokens), job=job)
+                if shared:
+                    metrics.inc("trigger.coalesced")
+                    logger.info(f"Attached '{job.hotkey}' press to an identical in-flight request")
+
+            total = time.perf_counter() - start
+            logger.info(
+                f"Handled '{job.hotkey}' in {total * 1000:.0f} ms",
+                extra={"hotkey": job.hotkey, "queue_ms": round(queued * 1000, 1),
+                       "capture_ms": round((capture or 0) * 1000, 1), "total_ms": round(total * 1000, 1),
+                       "chars_in": len(highlighted_text), "model": model, "max_tokens": max_tokens,
+                       "shared": shared})
+        except JobCancelled:
+            raise
+        except Exception as e:
+            metrics.inc("trigger.errors")
+            logger.error(f"An error occurred: {e}")
+
+    def _repaste(self):
+        # Pastes the latest answer again straight from the history
+        entry = self.history.latest() if self.history is not None else None
+        if entry is None:
+            logger.warning("Nothing in the history to re-paste.")
+            return
+        metrics.inc("trigger.repaste")
+        with metrics.timer("trigger.paste"):
+            self.clipboard.paste_text(entry["output"])
+
+    def _respond(self, job, prompt, highlighted_text, model, max_tokens):
+        start = time.perf_counter()
+        hotkey_info = (self.settings.get("hotkeys") or {}).get(job.hotkey) or {}
+        # Large selections are split and sent as concurrent requests
+        chunks = self.split_selection(highlighted_text, hotkey_info, model, max_tokens)
+        response = self._paste_stream(job, self.answer(
+            job, hotkey_info, prompt, chunks, model, max_tokens, stream=self.settings.get("stream", False)))
+
+        if self.history is not None and response is not None:
+            self.history.record(
+                job.hotkey, model, highlighted_text, response,
+                latency=time.perf_counter() - start, tokens=estimate_tokens(response))
+
+    def answer(self, job, hotkey_info, prompt, chunks, model, max_tokens, stream=True):
+        """Returns an iterator over the answer to the [(chunk, separator), ...]
+        of a selection, for the hotkey ``job.hotkey``. Shared with the batch
+        CLI, which passes ``hotkey_info`` with its own priority; pipeline
+        stages run at the priority of the hotkey that chains them."""
+        settings = self.settings
+        # Hotkeys can opt out of caching, e.g. open-ended "general" prompts
+        cache = self.cache if hotkey_info.get("cache", True) else None
+        max_parallel = (settings.get("chunking") or {}).get("max_parallel", 4)
+
+        if hotkey_info.get("pipeline"):
+            # Chained prompts always stream, so later stages can start early
+            stages = pipeline_stages(settings.get("hotkeys") or {}, job.hotkey)
+            if "priority" in hotkey_info:
+                stages = [dict(stage, priority=hotkey_info["priority"]) for stage in stages]
+            return chain_stream(chunks, [partial(self._stage_stream, job, stage) for stage in stages])
+        if stream:
+            request = partial(
+                self._stream_chunk, prompt, model, max_tokens, hotkey_info, job, cache)
+            if len(chunks) > 1:
+                return stream_chunks(chunks, request, max_parallel)
+            return request(chunks[0][0])
+        # Whole answers go through the sink too, so a split selection is
+        # pasted chunk by chunk instead of held until the last one is done
+        request = partial(self._complete_chunk, prompt, model, max_tokens, hotkey_info, job, cache)
+        if len(chunks) > 1:
+            return iter_chunks(chunks, request, max_parallel)
+        return iter([request(chunks[0][0])])
+
+    def _paste_stream(self, job, response_generator):
+        # Returns the answer for the history, or None once it grows past
+        # max_response_chars; from then on pasted text is let go right away
+        max_chars = (self.settings.get("limits") or {}).get("max_response_chars")
+        parts = []
+        kept = 0
+        with self.clipboard.paste_session(job) as paste, PasteSink.from_settings(paste, self.settings) as sink:
+            for content in response_generator:
+                job.check_cancelled()
+                sink.write(content)
+                if parts is not None:
+                    kept += len(content)
+                    parts.append(content)
+                    if max_chars and kept > max_chars:
+                        logger.info(f"Answer is longer than {max_chars} characters, not keeping it")
+                        parts = None
+        metrics.observe("trigger.paste", sink.paste_time)
+        metrics.observe("trigger.paste_flushes", sink.flushes, unit="count")
+        return "".join(parts) if parts is not None else None
+
+    def _reject(self, title, message):
+        logger.warning(f"{title}: {message}")
+        if self.notify is not None:
+            self.notify(title, message)
+
+    def split_selection(self, text, hotkey_info, model=None, max_tokens=None):
+        chunks = split_for_settings(text, self.settings, hotkey_info, model, max_tokens)
+        if len(chunks) == 1:
+            return chunks
+        metrics.observe("trigger.chunks", len(chunks), unit="count")
+        logger.info(f"Split a {len(text)} character selection into {len(chunks)} chunks")
+        return chunks
+
+    @staticmethod
+    def _messages(prompt, text):
+        return [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": text}
+        ]
+
+    def _stream_chunk(self, prompt, model, max_tokens, hotkey_info, job, cache, text):
+        return self.backends.stream(
+            self._messages(prompt, text), max_tokens, hotkey_info=hotkey_info, job=job, cache=cache,
+            model=model)
+
+    def _complete_chunk(self, prompt, model, max_tokens, hotkey_info, job, cache, text):
+        return self.backends.complete(
+            self._messages(prompt, text), max_tokens, hotkey_info=hotkey_info, job=job, cache=cache,
+            model=model)
+
+    def _stage_stream(self, job, stage_info, text):
+        # One request of a pipeline stage, sized by the stage's own policy
+        model, max_tokens = self.policy.select(stage_info, text)
+        cache = self.cache if stage_info.get("cache", True) else None
+        return self.backends.stream(
+            self._messages(stage_info["prompt"], text), max_tokens, hotkey_info=stage_info, job=job,
+            cache=cache, model=model)
@@ -1,17 +1,14 @@
 import logging
+import socket
+import time
 
-import openai
+from metrics import metrics
 
-# Configure the logging for utils.py
-logging.basicConfig(
-    filename='app.log',
-    level=logging.INFO,
-    format='%(asctime)s %(name)s %(levelname)s: %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
 def get_openai_models(client):
+    import openai  # Deferred so importing utils stays cheap at startup
     try:
         models = client.models.list()
         # Filter out only models that begin with 'gpt-'
@@ -37,7 +34,15 @@ def get_openai_models(client):
         return []
 
 
-def get_openai_stream_response(client, messages, max_tokens, model):
+def get_openai_stream_response(client, messages, max_tokens, model, job=None, cache=None):
+    # Complete answers are stored in ``cache``; looking them up is left to
+    # the caller, before it spends any rate limit budget
+    key = cache.key_for(model, messages, max_tokens) if cache is not None else None
+    parts = []
+    collected = 0
+    start = time.perf_counter()
+    first_chunk_at = None
+    chunks = 0
     try:
         response = client.chat.completions.create(
             model=model,
@@ -45,16 +50,67 @@ def get_openai_stream_response(client, messages, max_tokens, model):
             max_tokens=max_tokens,
             stream=True
         )
+        if job is not None:
+            # Cancelling the job closes the HTTP stream
+            job.on_cancel(lambda: _abort_stream(response))
         for chunk in response:
             if chunk.choices[0].delta.content:  # Corrected attribute access
+                if first_chunk_at is None:
+                    first_chunk_at = time.perf_counter()
+                    metrics.observe("request.ttft", first_chunk_at - start)
+                chunks += 1
+                if key is not None:
+                    parts.append(chunk.choices[0].delta.content)
+                    collected += len(parts[-1])
+                    if not cache.accepts(collected):
+                        # Too long to be cached: stop holding on to it
+                        key, parts = None, []
                 # Yield each chunk content
                 yield chunk.choices[0].delta.content
-    except Exception as e:
-        logger.error(f"An error occurred during OpenAI API call: {e}")
+    except Exception:
+        if job is not None:
+            job.check_cancelled()  # Closed by cancel(), not a real failure
+        # Not logged here: the caller may still retry or fail over
+        metrics.inc("request.errors")
         raise
 
+    end = time.perf_counter()
+    metrics.observe("request.total", end - start)
+    metrics.observe("request.generation", end - (first_chunk_at or end))
+    # Each content chunk carries about one token
+    metrics.observe("request.chunks", chunks, unit="count")
+
+    # Only complete answers are cached
+    if key is not None and not (job is not None and job.cancelled):
+        cache.put(key, "".join(parts))
+
+
+def _abort_stream(response):
+    # Closing the stream alone does not wake a read that is still waiting
+    # for the next bytes, e.g. before the first token; shutting the socket
+    # down does. An HTTP/2 socket is shared with other requests, so those
+    # are only closed.
+    http_response = response.response
+    network_stream = http_response.extensions.get("network_stream")
+    if network_stream is not None and http_response.http_version == "HTTP/1.1":
+        sock = network_stream.get_extra_info("socket")
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+    response.close()
 
-def get_openai_non_stream_response(client, messages, max_tokens, model):
+
+def get_openai_non_stream_response(client, messages, max_tokens, model, job=None, cache=None):
+    if job is not None:
+        # A plain request cannot be aborted once it is sent, so one that may
+        # be cancelled (a hedged loser, a cancelled tray job) is streamed and
+        # joined: cancelling the job closes it and frees the connection
+        return "".join(get_openai_stream_response(
+            client, messages=messages, max_tokens=max_tokens, model=model, job=job, cache=cache))
+    key = cache.key_for(model, messages, max_tokens) if cache is not None else None
+    start = time.perf_counter()
     try:
         response = client.chat.completions.create(
             model=model,
@@ -63,15 +119,26 @@ def get_openai_non_stream_response(client, messages, max_tokens, model):
             stream=False
         )
         # Correctly access the 'content' attribute using dot notation
-        return response.choices[0].message.content
-    except Exception as e:
-        logger.error(f"An error occurred during OpenAI API call: {e}")
+        content = response.choices[0].message.content
+    except Exception:
+        metrics.inc("request.errors")
         raise
 
+    metrics.observe("request.total", time.perf_counter() - start)
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        metrics.observe("request.prompt_tokens", usage.prompt_tokens, unit="count")
+        metrics.observe("request.completion_tokens", usage.completion_tokens, unit="count")
+
+    if key is not None:
+        cache.put(key, content)
+    return content
+
 
-def validate_model(model, client):
-    gpt_models = get_openai_models(client)
-    if model not in gpt_models:
+def validate_model(model, registry):
+    # O(1) lookup in the cached model list; nothing to check against until
+    # the first refresh has completed
+    if registry.is_known() and model not in registry:
         raise ValueError(f"The model {model} is not a valid GPT model.")
 
 